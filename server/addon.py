@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass, field
 from typing import Type
 
@@ -10,9 +11,15 @@ from ayon_server.actions import (
 from ayon_server.entity_lists import EntityList
 from ayon_server.events import dispatch_event
 from ayon_server.forms import SimpleForm, FormSelectOption
+from ayon_server.lib.postgres import Postgres
 
 from .settings import SyncsketchSettings
 
+# Priority of sync events triggered by users
+# - processor handles events with higher priority first, automated or bulk
+#   syncs should use lower value to not block users
+INTERACTIVE_SYNC_PRIORITY = 10
+
 
 @dataclass
 class ActionProjectSelection:
@@ -85,11 +92,15 @@ class SyncsketchAddon(BaseServerAddon):
                 success=False,
             )
 
-        list_entities = []
-        for list_id in context.entity_ids:
-            list_entity = await EntityList.load(project_name, list_id)
-            if list_entity.entity_type == "version":
-                list_entities.append(list_entity)
+        loaded_list_entities = await asyncio.gather(*(
+            EntityList.load(project_name, list_id)
+            for list_id in context.entity_ids
+        ))
+        list_entities = [
+            list_entity
+            for list_entity in loaded_list_entities
+            if list_entity.entity_type == "version"
+        ]
 
         if not list_entities:
             return await executor.get_simple_response(
@@ -124,23 +135,72 @@ class SyncsketchAddon(BaseServerAddon):
                 success=False,
             )
 
+        list_ids = [list_entity.id for list_entity in list_entities]
+        queued_list_ids = await self._get_queued_list_ids(
+            topic, project_name, list_ids
+        )
+        dispatches = []
         for list_entity in list_entities:
-            summary = {"listId": list_entity.id}
+            # Job for the list is already waiting or running
+            if list_entity.id in queued_list_ids:
+                continue
+
+            summary = {
+                "listId": list_entity.id,
+                "priority": INTERACTIVE_SYNC_PRIORITY,
+            }
             if sketch_project_name:
                 summary["syncsketchProject"] = sketch_project_name
 
-            await dispatch_event(
+            dispatches.append(dispatch_event(
                 topic,
                 project=project_name,
                 summary=summary,
                 finished=False,
                 description=description,
+            ))
+        await asyncio.gather(*dispatches)
+        triggered_count = len(dispatches)
+
+        if not triggered_count:
+            message = "SyncSketch sync is already queued"
+        elif queued_list_ids:
+            message = (
+                f"SyncSketch sync has been triggered for {triggered_count}"
+                f" lists, {len(queued_list_ids)} lists are already queued"
             )
+        else:
+            message = "SyncSketch sync has been triggered"
 
-        return await executor.get_simple_response(
-            "SyncSketch sync has been triggered",
-            success=True,
-        )
+        return await executor.get_simple_response(message, success=True)
+
+    async def _get_queued_list_ids(
+        self,
+        topic: str,
+        project_name: str,
+        list_ids: list[str],
+    ) -> set[str]:
+        """Get ids of lists that already have unfinished sync event.
+
+        Args:
+            topic (str): Event topic.
+            project_name (str): The AYON project name.
+            list_ids (list[str]): Ids of lists to check.
+
+        Returns:
+            set[str]: Ids of lists with 'pending' or 'in_progress' event.
+
+        """
+        query = """
+            SELECT DISTINCT summary->>'listId' AS list_id
+            FROM public.events
+            WHERE topic = $1
+            AND project_name = $2
+            AND status IN ('pending', 'in_progress')
+            AND summary->>'listId' = ANY($3)
+        """
+        rows = await Postgres.fetch(query, topic, project_name, list_ids)
+        return {row["list_id"] for row in rows}
 
     async def _push_prepare_data(
         self,
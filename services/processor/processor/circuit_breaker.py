@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Call was not made because the service is considered unavailable."""
+    pass
+
+
+class CircuitBreaker:
+    """Stop calling a service after repeated failures.
+
+    Circuit opens after number of consecutive failures, e.g. connection
+    errors or server errors. While open, calls fail right away. After
+    reset timeout one trial call is allowed, circuit closes when it
+    succeeds and opens again when it fails.
+
+    Args:
+        name (str): Name of service used in logs.
+        failure_threshold (int): Consecutive failures that open circuit.
+        reset_timeout (float): Seconds after which trial call is allowed.
+
+    """
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ) -> None:
+        self._name = name
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == CLOSED
+
+    def time_until_trial(self) -> float:
+        """Seconds until trial call is allowed, '0' when closed."""
+        with self._lock:
+            if self._state == CLOSED:
+                return 0.0
+            return max(
+                0.0, self._opened_at + self._reset_timeout - time.monotonic()
+            )
+
+    def allow_request(self) -> bool:
+        """Call can be made, trial call is allowed after reset timeout."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                # Trial call is in progress
+                return False
+            if time.monotonic() - self._opened_at < self._reset_timeout:
+                return False
+            self._state = HALF_OPEN
+            return True
+
+    def check(self) -> None:
+        """Raise if call can't be made.
+
+        Raises:
+            CircuitOpenError: Service is considered unavailable.
+
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(
+                f"{self._name} is unavailable. Calls are paused."
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            previous_state = self._state
+            self._state = CLOSED
+            self._failures = 0
+        if previous_state != CLOSED:
+            logging.info(f"{self._name} is available again.")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == CLOSED:
+                if self._failures < self._failure_threshold:
+                    return
+                logging.warning(
+                    f"{self._name} failed {self._failures} times in a row."
+                    f" Pausing calls for {self._reset_timeout:g}s."
+                )
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+
+_default_circuit_breaker = CircuitBreaker("SyncSketch")
+
+
+def get_default_circuit_breaker() -> CircuitBreaker:
+    """Circuit breaker shared by all SyncSketch clients of the process."""
+    return _default_circuit_breaker
+
+
+def set_default_circuit_breaker(circuit_breaker: CircuitBreaker) -> None:
+    global _default_circuit_breaker
+    _default_circuit_breaker = circuit_breaker
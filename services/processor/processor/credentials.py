@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+import requests
+
+from .lib import (
+    SyncsketchConfig,
+    get_syncksketch_settings,
+    get_syncsketch_config,
+    validate_syncsketch_credentials,
+)
+
+
+class CredentialsCache:
+    """SyncSketch credentials from addon settings validated in background.
+
+    Settings and secrets are fetched and validated in a background thread
+    when cache expires or is invalidated, e.g. when addon settings did
+    change or SyncSketch refused the credentials. Rotated credentials are
+    picked up without restart of the processor and consumers never wait
+    for settings fetch when valid credentials are cached.
+
+    Args:
+        ttl (float): Seconds after which credentials are validated again.
+        retry_interval (float): Seconds between validations while
+            credentials are invalid.
+
+    """
+    def __init__(self, ttl: float, retry_interval: float = 5.0) -> None:
+        self._ttl = ttl
+        self._retry_interval = retry_interval
+        self._config: SyncsketchConfig | None = None
+        self._valid: bool = False
+        self._validated_at: float = 0.0
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._refresh_event = threading.Event()
+        self._changed_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def config(self) -> SyncsketchConfig | None:
+        """Last valid credentials."""
+        with self._lock:
+            return self._config
+
+    @property
+    def is_valid(self) -> bool:
+        with self._lock:
+            return self._valid
+
+    @property
+    def validated_at(self) -> float:
+        with self._lock:
+            return self._validated_at
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="syncsketch-credentials", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._refresh_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        self._session.close()
+
+    def invalidate(self) -> None:
+        """Validate credentials again as soon as possible."""
+        self._refresh_event.set()
+
+    def wait_for_validation(self, timeout: float | None = None) -> bool:
+        """Wait until next validation finishes.
+
+        Returns:
+            bool: Credentials are valid.
+
+        """
+        self._changed_event.wait(timeout)
+        return self.is_valid
+
+    def refresh(self) -> bool:
+        """Fetch and validate credentials from addon settings.
+
+        Returns:
+            bool: Credentials are valid.
+
+        """
+        try:
+            settings = get_syncksketch_settings()
+            config = get_syncsketch_config(settings)
+            valid = validate_syncsketch_credentials(
+                config, session=self._session
+            )
+        except Exception:
+            logging.warning(
+                "Failed to validate SyncSketch credentials.", exc_info=True
+            )
+            # Keep last known state, settings or SyncSketch may be
+            #   just temporarily unavailable
+            return self.is_valid
+
+        with self._lock:
+            previous_config = self._config
+            if valid:
+                self._config = config
+            self._valid = valid
+            self._validated_at = time.time()
+
+        if valid and previous_config is not None and previous_config != config:
+            logging.info("SyncSketch credentials did change.")
+        self._changed_event.set()
+        self._changed_event.clear()
+        return valid
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self._refresh_event.clear()
+            valid = self.refresh()
+            timeout = self._ttl if valid else self._retry_interval
+            self._refresh_event.wait(timeout)
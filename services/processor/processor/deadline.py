@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+
+# Seconds of a single request when deadline does not limit it more
+DEFAULT_REQUEST_TIMEOUT = 60.0
+
+
+class DeadlineExceeded(Exception):
+    """Time budget of a job ran out."""
+    pass
+
+
+class Deadline:
+    """Time budget shared by all calls made by a job.
+
+    Args:
+        seconds (float | None): Budget in seconds, unlimited if not set.
+
+    """
+    def __init__(self, seconds: float | None = None) -> None:
+        self._seconds = seconds
+        self._expires_at: float | None = None
+        if seconds is not None:
+            self._expires_at = time.monotonic() + seconds
+
+    @property
+    def seconds(self) -> float | None:
+        return self._seconds
+
+    def remaining(self) -> float | None:
+        """Remaining seconds or None if unlimited."""
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def check(self) -> None:
+        """Raise if budget ran out.
+
+        Raises:
+            DeadlineExceeded: Budget ran out.
+
+        """
+        if self.remaining() == 0.0:
+            raise DeadlineExceeded(
+                f"Job did not finish in {self._seconds:g} seconds."
+            )
+
+    def timeout(self, cap: float = DEFAULT_REQUEST_TIMEOUT) -> float:
+        """Timeout for next call derived from remaining budget.
+
+        Args:
+            cap (float): Maximum timeout of the call.
+
+        Returns:
+            float: Timeout in seconds.
+
+        Raises:
+            DeadlineExceeded: Budget ran out.
+
+        """
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return min(cap, remaining)
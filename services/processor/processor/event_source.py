@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import fnmatch
+import json
+import logging
+import threading
+from typing import Any, Callable, Iterable
+
+try:
+    import websocket
+    # Connection errors are logged by the event source
+    logging.getLogger("websocket").setLevel(logging.CRITICAL)
+except ImportError:
+    websocket = None
+
+
+class EventWakeup:
+    """Wake up signal shared between event source and listen loop."""
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def notify(self) -> None:
+        self._event.set()
+
+    def clear(self) -> None:
+        self._event.clear()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait for notification.
+
+        Returns:
+            bool: Notification was received before timeout.
+
+        """
+        return self._event.wait(timeout)
+
+
+class EventSource:
+    """Base of event sources.
+
+    Polling of pending events is always used as a fallback, event source
+    only shortens time between dispatch of an event and its processing.
+
+    Source calls 'notify' on wakeup object when event with one of the
+    topics is dispatched on server. The base implementation does nothing,
+    which means the listen loop relies on polling only.
+
+    Args:
+        topics (Iterable[str]): Topics that should wake up the loop.
+
+    """
+    def __init__(self, topics: Iterable[str]) -> None:
+        self._topics = list(topics)
+        self._wakeup: EventWakeup | None = None
+        self._callbacks: list[
+            tuple[list[str], Callable[[dict[str, Any]], None]]
+        ] = []
+
+    @property
+    def is_connected(self) -> bool:
+        """Source is receiving events, so polling can be less frequent."""
+        return False
+
+    def subscribe(
+        self,
+        topics: Iterable[str],
+        callback: Callable[[dict[str, Any]], None],
+    ) -> None:
+        """Call callback when event with one of topics is received.
+
+        Must be called before source is started.
+
+        """
+        self._callbacks.append((list(topics), callback))
+
+    def get_subscribed_topics(self) -> list[str]:
+        topics = list(self._topics)
+        for callback_topics, _ in self._callbacks:
+            for topic in callback_topics:
+                if topic not in topics:
+                    topics.append(topic)
+        return topics
+
+    def start(self, wakeup: EventWakeup) -> None:
+        self._wakeup = wakeup
+
+    def stop(self) -> None:
+        pass
+
+    def matches_topic(
+        self, topic: str | None, patterns: Iterable[str] | None = None
+    ) -> bool:
+        if not topic:
+            return False
+        if patterns is None:
+            patterns = self._topics
+        return any(
+            fnmatch.fnmatchcase(topic, pattern)
+            for pattern in patterns
+        )
+
+    def on_event(self, event: dict[str, Any]) -> None:
+        """Process event received from server."""
+        topic = event.get("topic")
+        if self._wakeup is not None and self.matches_topic(topic):
+            self._wakeup.notify()
+
+        for topics, callback in self._callbacks:
+            if not self.matches_topic(topic, topics):
+                continue
+            try:
+                callback(event)
+            except Exception:
+                logging.warning(
+                    f"Failed to process event '{topic}'.", exc_info=True
+                )
+
+
+class WebsocketEventSource(EventSource):
+    """Receive events from AYON server event stream.
+
+    Connection is kept open in a background thread and is reconnected
+    when dropped. Source is considered connected only after first message
+    is received from server, authorization might be refused without
+    closing the connection.
+
+    Args:
+        server_url (str): AYON server url.
+        token (str): Token used to authorize the connection.
+        topics (Iterable[str]): Topics that should wake up the loop.
+        reconnect_delay (float): Maximum delay between reconnect attempts.
+
+    """
+    def __init__(
+        self,
+        server_url: str,
+        token: str,
+        topics: Iterable[str],
+        reconnect_delay: float = 30.0,
+    ) -> None:
+        super().__init__(topics)
+        ws_url = server_url.rstrip("/")
+        if ws_url.startswith("http"):
+            ws_url = "ws" + ws_url[4:]
+        self._url = f"{ws_url}/ws"
+        self._token = token
+        self._reconnect_delay = reconnect_delay
+        self._stop_event = threading.Event()
+        self._connected = False
+        self._app = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def start(self, wakeup: EventWakeup) -> None:
+        super().start(wakeup)
+        if websocket is None:
+            logging.warning(
+                "Package 'websocket-client' is not available."
+                " Using polling of events only."
+            )
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="syncsketch-event-source", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        app = self._app
+        if app is not None:
+            app.close()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self) -> None:
+        delay = 1.0
+        failure_logged = False
+        while not self._stop_event.is_set():
+            self._app = websocket.WebSocketApp(
+                self._url,
+                header={"X-Api-Key": self._token},
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+            )
+            self._app.run_forever(ping_interval=30, ping_timeout=10)
+            was_connected = self._connected
+            self._connected = False
+            self._app = None
+            if self._stop_event.is_set():
+                break
+
+            if was_connected:
+                delay = 1.0
+                failure_logged = False
+                logging.info("Event stream disconnected. Reconnecting.")
+
+            elif not failure_logged:
+                failure_logged = True
+                logging.warning(
+                    f"Failed to connect to AYON event stream '{self._url}'."
+                    " Using polling of events until connected."
+                )
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, self._reconnect_delay)
+
+    def _on_open(self, app) -> None:
+        app.send(json.dumps({
+            "topic": "auth",
+            "token": self._token,
+            "subscribe": self.get_subscribed_topics(),
+        }))
+        # Events might have been dispatched while disconnected
+        if self._wakeup is not None:
+            self._wakeup.notify()
+
+    def _on_message(self, app, message: str) -> None:
+        try:
+            event = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(event, dict):
+            return
+
+        # Server accepted authorization, e.g. sends heartbeats
+        if not self._connected:
+            self._connected = True
+            logging.info("Subscribed to AYON event stream.")
+        self.on_event(event)
+
+    def _on_error(self, app, error: Exception) -> None:
+        logging.debug(f"Event stream error: {error}")
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import copy
+import logging
+import threading
+import time
+from typing import Any
+
+import ayon_api
+
+from .deadline import Deadline
+from .leases import Lease
+
+
+class JobInterrupted(Exception):
+    """Job was stopped before it finished and can be resumed later."""
+    pass
+
+
+class LeaseLost(Exception):
+    """Other worker took over the job event, job must not touch it."""
+    pass
+
+
+class JobContext:
+    """Context of job processing single job event.
+
+    Job stores progress checkpoints to payload of the event, so a job
+    interrupted e.g. by processor restart can continue where it stopped
+    instead of starting over.
+
+    Job also measures duration and transferred bytes of its phases. Time
+    between start of a phase and start of next phase is added to the
+    phase, so phases repeated for each item are summed up.
+
+    Args:
+        event (dict[str, Any]): Job event data.
+        interrupt_event (threading.Event | None): Event set when job
+            should stop at the next checkpoint.
+        deadline (Deadline | None): Time budget of the job.
+        lease (Lease | None): Lease of the job event. Job stops and does
+            not store checkpoints when the lease is lost.
+
+    """
+    def __init__(
+        self,
+        event: dict[str, Any],
+        interrupt_event: threading.Event | None = None,
+        deadline: Deadline | None = None,
+        lease: Lease | None = None,
+    ) -> None:
+        if interrupt_event is None:
+            interrupt_event = threading.Event()
+        if deadline is None:
+            deadline = Deadline()
+        self._event_id: str = event["id"]
+        self._payload: dict[str, Any] = copy.deepcopy(
+            event.get("payload") or {}
+        )
+        self._interrupt_event = interrupt_event
+        self._deadline = deadline
+        self._lease = lease
+        self._started_at: float = time.perf_counter()
+        self._phases: dict[str, dict[str, Any]] = {}
+        self._phase: str | None = None
+        self._phase_started_at: float = 0.0
+
+    @property
+    def event_id(self) -> str:
+        return self._event_id
+
+    @property
+    def deadline(self) -> Deadline:
+        return self._deadline
+
+    @property
+    def is_lease_lost(self) -> bool:
+        return self._lease is not None and self._lease.lost
+
+    @property
+    def payload(self) -> dict[str, Any]:
+        return self._payload
+
+    @property
+    def checkpoint(self) -> dict[str, Any]:
+        return self._payload.setdefault("checkpoint", {})
+
+    @property
+    def is_resumed(self) -> bool:
+        return bool(self._payload.get("checkpoint"))
+
+    def get_done_items(self, key: str) -> dict[str, Any]:
+        """Get items finished by previous runs of the job.
+
+        Args:
+            key (str): Key of items in checkpoint.
+
+        Returns:
+            dict[str, Any]: Result of item by item id.
+
+        """
+        return self.checkpoint.setdefault(key, {})
+
+    def mark_item_done(self, key: str, item_id: Any, result: Any) -> None:
+        """Store that item was processed to event payload."""
+        self.get_done_items(key)[str(item_id)] = result
+        self.save_checkpoint()
+
+    def save_checkpoint(self) -> None:
+        # Event belongs to other attempt, its payload must stay untouched
+        if self.is_lease_lost:
+            return
+        try:
+            ayon_api.update_event(self._event_id, payload=self._payload)
+        except Exception:
+            # Missing checkpoint only means more work on resume
+            logging.warning(
+                f"Failed to store checkpoint of event {self._event_id}.",
+                exc_info=True,
+            )
+
+    def start_phase(self, name: str) -> None:
+        """Start next phase of the job, current phase ends.
+
+        Args:
+            name (str): Name of phase.
+
+        """
+        now = time.perf_counter()
+        self._end_phase(now)
+        phase = self._phases.setdefault(
+            name, {"duration": 0.0, "count": 0, "bytes": 0}
+        )
+        phase["count"] += 1
+        self._phase = name
+        self._phase_started_at = now
+
+    def add_phase_bytes(self, size: int) -> None:
+        """Add bytes transferred in current phase."""
+        if self._phase is not None:
+            self._phases[self._phase]["bytes"] += size
+
+    def get_timing(self) -> dict[str, Any]:
+        """End current phase and get timing of the job.
+
+        Returns:
+            dict[str, Any]: Total duration in seconds and duration, number
+                of runs and transferred bytes by phase name.
+
+        """
+        now = time.perf_counter()
+        self._end_phase(now)
+        self._phase = None
+        return {
+            "duration": round(now - self._started_at, 3),
+            "phases": {
+                name: {**phase, "duration": round(phase["duration"], 3)}
+                for name, phase in self._phases.items()
+            },
+        }
+
+    def check_interrupt(self) -> None:
+        """Stop the job if processor is shutting down, time ran out or lease
+        was lost.
+
+        Raises:
+            LeaseLost: Job event was taken over by other attempt.
+            JobInterrupted: Job should stop.
+            DeadlineExceeded: Time budget of the job ran out.
+
+        """
+        if self.is_lease_lost:
+            raise LeaseLost(
+                f"Lease of event {self._event_id} was lost."
+            )
+        if self._interrupt_event.is_set():
+            raise JobInterrupted(
+                f"Job of event {self._event_id} was interrupted."
+            )
+        self._deadline.check()
+
+    def _end_phase(self, now: float) -> None:
+        if self._phase is not None:
+            self._phases[self._phase]["duration"] += (
+                now - self._phase_started_at
+            )
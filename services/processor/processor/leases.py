@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+import ayon_api
+
+LEASE_TOPIC = "syncsketch.lease"
+# Key in job event payload counting attempts that did not finish
+STALE_ATTEMPTS_KEY = "staleAttempts"
+
+
+def create_worker_id() -> str:
+    """Create identifier of this processor used on leases."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def format_event_time(value: float) -> str:
+    """Convert epoch time to iso datetime used in event filters."""
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+def parse_event_time(value: str) -> float:
+    """Convert event iso datetime to epoch time."""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+@dataclass
+class Lease:
+    event_id: str
+    attempt: int
+    acquired_at: float
+    last_heartbeat: float
+    lost: bool = False
+    finished: bool = False
+    # Serializes heartbeats with the final update of the event
+    lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+
+class LeaseManager:
+    """Claim job events atomically across processor replicas.
+
+    Event is claimed by dispatching a lease event with a hash based on
+    job event id and attempt. Event hash is unique on server, so only one
+    processor can create the lease for an attempt.
+
+    Worker sends heartbeats on claimed events while processing them. Job
+    event 'in_progress' without heartbeat for longer than stale age, e.g.
+    because its processor crashed, is returned to 'pending' with increased
+    attempt (retries), so any processor can claim it again. Such attempts
+    are also counted in event payload and the event is marked as failed
+    when the count reaches maximum number of attempts. Attempts returned
+    to 'pending' by the processor itself, e.g. on shutdown, don't count.
+
+    Event that stayed 'pending' with lease of its current attempt older
+    than lease timeout, e.g. because processor crashed right after lease
+    was created, is requeued the same way.
+
+    Args:
+        topics (Iterable[str]): Job event topics.
+        worker_id (str): Identifier of this processor.
+        lease_timeout (float): Seconds after which lease without heartbeat
+            expires.
+        heartbeat_interval (float): Seconds between heartbeats.
+        stale_age (float | None): Seconds without heartbeat after which
+            event is requeued. Lease timeout is used if not set or lower.
+        max_attempts (int): Maximum attempts to process an event that
+            did not finish.
+
+    """
+    def __init__(
+        self,
+        topics: Iterable[str],
+        worker_id: str,
+        lease_timeout: float,
+        heartbeat_interval: float,
+        stale_age: float | None = None,
+        max_attempts: int = 5,
+    ) -> None:
+        if stale_age is None or stale_age < lease_timeout:
+            stale_age = lease_timeout
+        self._topics = list(topics)
+        self._worker_id = worker_id
+        self._lease_timeout = lease_timeout
+        self._heartbeat_interval = heartbeat_interval
+        self._stale_age = stale_age
+        self._max_attempts = max_attempts
+        self._leases: dict[str, Lease] = {}
+        self._unclaimed_checked_at = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    def acquire(self, event: dict[str, Any]) -> Lease | None:
+        """Try to claim job event.
+
+        Args:
+            event (dict[str, Any]): Job event with 'id', 'project'
+                and 'retries'.
+
+        Returns:
+            Lease | None: Lease or None if other processor claimed
+                the event.
+
+        """
+        event_id = event["id"]
+        attempt = event.get("retries") or 0
+        response = ayon_api.post(
+            "events",
+            topic=LEASE_TOPIC,
+            sender=self._worker_id,
+            hash=f"{LEASE_TOPIC}.{event_id}.{attempt}",
+            project=event.get("project"),
+            description=f"Lease of event {event_id} (attempt {attempt})",
+            summary={
+                "eventId": event_id,
+                "attempt": attempt,
+                "workerId": self._worker_id,
+            },
+            payload={},
+            finished=True,
+            store=True,
+        )
+        if response.status_code >= 400:
+            if response.status_code != 409:
+                logging.warning(
+                    f"Failed to create lease of event {event_id}."
+                    f" Status code {response.status_code}."
+                )
+            return None
+
+        try:
+            ayon_api.update_event(
+                event_id,
+                sender=self._worker_id,
+                status="in_progress",
+            )
+        except Exception:
+            logging.warning(
+                f"Failed to mark event {event_id} as in progress.",
+                exc_info=True,
+            )
+            # Lease of current attempt can't be created again
+            self._try_requeue_event(
+                event_id,
+                attempt + 1,
+                f"Event {event_id} was claimed but not started",
+            )
+            return None
+
+        now = time.time()
+        lease = Lease(
+            event_id=event_id,
+            attempt=attempt,
+            acquired_at=now,
+            last_heartbeat=now,
+        )
+        with self._lock:
+            self._leases[event_id] = lease
+        return lease
+
+    def get_leases(self) -> list[Lease]:
+        """Leases of events processed by this processor."""
+        with self._lock:
+            return list(self._leases.values())
+
+    def finish(self, lease: Lease, **kwargs) -> bool:
+        """Store final state of leased event unless the lease was lost.
+
+        Heartbeats are not sent for the event after this call, so they
+        can't set it back to 'in_progress'.
+
+        Args:
+            lease (Lease): Lease of the event.
+            **kwargs: Arguments for 'ayon_api.update_event', e.g. status.
+
+        Returns:
+            bool: State was stored.
+
+        """
+        with lease.lock:
+            if lease.lost:
+                return False
+            lease.finished = True
+            ayon_api.update_event(lease.event_id, **kwargs)
+        return True
+
+    def requeue(self, lease: Lease) -> None:
+        """Return claimed event to 'pending' and release its lease.
+
+        Used when job of claimed event could not be started.
+
+        """
+        try:
+            with lease.lock:
+                lease.finished = True
+                self._try_requeue_event(
+                    lease.event_id,
+                    lease.attempt + 1,
+                    f"Job of event {lease.event_id} was not started",
+                )
+        finally:
+            self.release(lease)
+
+    def release(self, lease: Lease) -> None:
+        with self._lock:
+            self._leases.pop(lease.event_id, None)
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="syncsketch-leases", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def heartbeat(self) -> None:
+        """Send heartbeat for all claimed events."""
+        with self._lock:
+            leases = list(self._leases.values())
+
+        for lease in leases:
+            if lease.lost or lease.finished:
+                continue
+            try:
+                self._heartbeat_lease(lease)
+            except Exception:
+                logging.warning(
+                    f"Failed to send heartbeat of event {lease.event_id}.",
+                    exc_info=True,
+                )
+
+    def reclaim_expired(self) -> None:
+        """Return stale events back to 'pending' or fail them.
+
+        Called on processor start and periodically with heartbeats.
+
+        """
+        with self._lock:
+            own_event_ids = set(self._leases)
+
+        now = time.time()
+        for event in ayon_api.get_events(
+            self._topics,
+            statuses={"in_progress"},
+            fields={"id", "updatedAt", "retries"},
+        ):
+            event_id = event["id"]
+            if event_id in own_event_ids:
+                continue
+            heartbeat_age = now - parse_event_time(event["updatedAt"])
+            if heartbeat_age < self._stale_age:
+                continue
+
+            self._requeue_event(
+                event_id,
+                (event.get("retries") or 0) + 1,
+                f"Event {event_id} is stale {int(heartbeat_age)}s",
+            )
+
+        # Pending events are checked less often, lease lookup is expensive
+        if now - self._unclaimed_checked_at >= self._lease_timeout:
+            self._unclaimed_checked_at = now
+            self._reclaim_unclaimed(own_event_ids, now)
+
+    def _reclaim_unclaimed(
+        self, own_event_ids: set[str], now: float
+    ) -> None:
+        """Requeue 'pending' events with expired lease of current attempt.
+
+        Lease of the attempt can't be created again, so the events would
+        never be claimed.
+
+        """
+        expired_before = now - self._lease_timeout
+        updated_at_by_key: dict[tuple[str, int], float] = {}
+        for event in ayon_api.get_events(
+            self._topics,
+            statuses={"pending"},
+            older_than=format_event_time(expired_before),
+            fields={"id", "updatedAt", "retries"},
+        ):
+            if event["id"] in own_event_ids:
+                continue
+            updated_at = parse_event_time(event["updatedAt"])
+            if updated_at < expired_before:
+                key = (event["id"], event.get("retries") or 0)
+                updated_at_by_key[key] = updated_at
+
+        if not updated_at_by_key:
+            return
+
+        # Lease of current attempt was created after last update of event
+        for lease_event in ayon_api.get_events(
+            [LEASE_TOPIC],
+            newer_than=format_event_time(min(updated_at_by_key.values())),
+            older_than=format_event_time(expired_before),
+            fields={"summary"},
+        ):
+            summary = lease_event.get("summary") or {}
+            key = (summary.get("eventId"), summary.get("attempt"))
+            if updated_at_by_key.pop(key, None) is None:
+                continue
+            event_id, attempt = key
+            self._requeue_event(
+                event_id,
+                attempt + 1,
+                f"Event {event_id} was claimed but not started",
+            )
+
+    def _requeue_event(self, event_id: str, attempt: int, reason: str) -> None:
+        """Return event to 'pending' for next attempt or fail it.
+
+        Number of attempts that did not finish is increased in payload of
+        the event. Payload is updated as a whole, so it is fetched first
+        to keep checkpoints of the job.
+
+        Args:
+            event_id (str): Job event id.
+            attempt (int): Next attempt of the event.
+            reason (str): Why the event is requeued, used in logs.
+
+        """
+        event = ayon_api.get_event(event_id)
+        payload = event.get("payload") or {}
+        stale_attempts = (payload.get(STALE_ATTEMPTS_KEY) or 0) + 1
+        payload[STALE_ATTEMPTS_KEY] = stale_attempts
+        if stale_attempts >= self._max_attempts:
+            logging.error(
+                f"{reason} after {stale_attempts} unfinished attempts."
+                " Marking it as failed."
+            )
+            ayon_api.update_event(
+                event_id,
+                status="failed",
+                description=(
+                    f"Processing did not finish in {stale_attempts}"
+                    " attempts. Processor was probably killed during"
+                    " the job."
+                ),
+                payload=payload,
+                retries=attempt,
+            )
+            return
+
+        logging.warning(
+            f"{reason}. Returning it to pending (attempt {attempt},"
+            f" {stale_attempts} unfinished)."
+        )
+        ayon_api.update_event(
+            event_id,
+            status="pending",
+            payload=payload,
+            retries=attempt,
+        )
+
+    def _try_requeue_event(
+        self, event_id: str, attempt: int, reason: str
+    ) -> None:
+        # Stale event is requeued by 'reclaim_expired' if this fails
+        try:
+            self._requeue_event(event_id, attempt, reason)
+        except Exception:
+            logging.warning(
+                f"Failed to return event {event_id} to pending.",
+                exc_info=True,
+            )
+
+    def _heartbeat_lease(self, lease: Lease) -> None:
+        with lease.lock:
+            if lease.finished:
+                # Job stored its result meanwhile
+                return
+            event = ayon_api.get_event(lease.event_id)
+            attempt = event.get("retries") or 0
+            if attempt != lease.attempt or event["status"] != "in_progress":
+                lease.lost = True
+                logging.warning(
+                    f"Lease of event {lease.event_id} was lost."
+                    f" Event status is '{event['status']}'"
+                    f" on attempt {attempt}."
+                )
+                return
+
+            # Any change of event updates its 'updatedAt'
+            ayon_api.update_event(lease.event_id, status="in_progress")
+            lease.last_heartbeat = time.time()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self._heartbeat_interval):
+            self.heartbeat()
+            try:
+                self.reclaim_expired()
+            except Exception:
+                logging.warning(
+                    "Failed to reclaim expired leases.", exc_info=True
+                )
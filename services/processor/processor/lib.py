@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import json
+import logging
+import os
+import threading
 from dataclasses import dataclass
 from typing import Any
 
 import ayon_api
 import requests
 
+from .deadline import DEFAULT_REQUEST_TIMEOUT
+
+_thread_data = threading.local()
+
 
 @dataclass
 class SyncsketchConfig:
@@ -51,6 +59,8 @@ def get_syncsketch_config(
 def validate_syncsketch_credentials(
     config: SyncsketchConfig | None = None,
     settings: dict[str, Any] | None = None,
+    session: requests.Session | None = None,
+    timeout: float = DEFAULT_REQUEST_TIMEOUT,
 ) -> bool:
     """Check if SyncSketch credentials are set in the addon settings."""
     if config is None:
@@ -58,11 +68,95 @@ def validate_syncsketch_credentials(
     if not config.username or not config.api_key:
         return False
 
-    response = requests.get(
+    if session is None:
+        session = requests
+    response = session.get(
         f"{config.server_url}/api/v1/person/connected/",
         params={
             "api_key": config.api_key,
             "username": config.username,
         },
+        timeout=timeout,
     )
+    # Unavailable server does not mean invalid credentials
+    if response.status_code >= 500:
+        response.raise_for_status()
     return response.status_code == 200
+
+
+def get_event_summary(event: dict[str, Any]) -> dict[str, Any]:
+    """Get summary of event from REST or GraphQl response."""
+    # GraphQl returns summary as json string
+    summary = event.get("summary") or {}
+    if isinstance(summary, str):
+        summary = json.loads(summary)
+    return summary
+
+
+def get_env_int(name: str, default: int) -> int:
+    """Get integer value from environment variable.
+
+    Invalid values are logged and default value is used instead.
+
+    """
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logging.warning(
+            f"Invalid value '{value}' of environment variable '{name}'."
+            f" Using default value {default}."
+        )
+    return default
+
+
+def get_env_float(name: str, default: float) -> float:
+    """Get float value from environment variable.
+
+    Invalid values are logged and default value is used instead.
+
+    """
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logging.warning(
+            f"Invalid value '{value}' of environment variable '{name}'."
+            f" Using default value {default}."
+        )
+    return default
+
+
+def get_env_list(name: str) -> list[str]:
+    """Get comma separated values from environment variable."""
+    value = os.environ.get(name) or ""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def get_thread_ayon_connection() -> ayon_api.ServerAPI:
+    """Get AYON connection dedicated to current thread.
+
+    Global connection is shared by all workers and changes of its state,
+    e.g. using 'as_username', would affect jobs running in other threads.
+
+    Returns:
+        ayon_api.ServerAPI: Connection created for current thread.
+
+    """
+    con = getattr(_thread_data, "ayon_connection", None)
+    if con is None:
+        global_con = ayon_api.get_server_api_connection()
+        con = ayon_api.ServerAPI(
+            global_con.get_base_url(),
+            token=global_con.access_token,
+            sender_type=global_con.get_sender_type(),
+            sender=global_con.get_sender(),
+            ssl_verify=global_con.get_ssl_verify(),
+            cert=global_con.get_cert(),
+        )
+        _thread_data.ayon_connection = con
+    return con
@@ -7,18 +7,176 @@ from typing import Any
 import urllib.request
 
 import ayon_api
+import requests
 
-from .lib import SyncsketchConfig
-from .syncsketch_api import SyncSketchAPI
+from .jobs import JobContext
+from .lib import SyncsketchConfig, get_thread_ayon_connection
+from .metrics import TRANSFERRED_BYTES, measure_call
+from .resolution_cache import (
+    PROJECT_KIND,
+    REVIEW_KIND,
+    get_default_resolution_cache,
+)
+from .syncsketch_api import SyncSketchAPI, get_resource_id
 
 
 class SyncError(Exception):
     pass
 
 
+def _find_sketch_project(
+    syncsketch_api: SyncSketchAPI, name: str
+) -> dict[str, Any] | None:
+    """Find SyncSketch project by name, case insensitive.
+
+    Returns:
+        dict[str, Any] | None: Project with 'id' and 'name' or None if
+            it does not exist.
+
+    """
+    cache = get_default_resolution_cache()
+    server_url = syncsketch_api.server_url
+    project = cache.get(server_url, PROJECT_KIND, name.lower())
+    if project is None:
+        project = syncsketch_api.get_project_by_name(
+            name, fields={"id", "name"}
+        )
+        if project is not None:
+            project = {"id": project["id"], "name": project["name"]}
+            cache.set(server_url, PROJECT_KIND, name.lower(), project)
+    return project
+
+
+def _find_sketch_review(
+    syncsketch_api: SyncSketchAPI,
+    project_id: int,
+    list_id: str,
+    review_id: int | None,
+    label: str,
+) -> dict[str, Any]:
+    """Find SyncSketch review of AYON list with its items.
+
+    Review id resolved by previous job of the list is used if cached.
+    Otherwise review is found by stored id, or by name as fallback.
+
+    Returns:
+        dict[str, Any]: Review with 'items' or empty dict if not found.
+
+    """
+    cache = get_default_resolution_cache()
+    server_url = syncsketch_api.server_url
+    cache_key = (project_id, list_id)
+    cached_review_id = cache.get(server_url, REVIEW_KIND, cache_key)
+    if cached_review_id is not None:
+        # Items are not included in review data
+        # - it can be included in the review, but the payload would
+        #   be huge
+        items = syncsketch_api.get_review_items(cached_review_id)
+        # Deleted review does not have items, check if it still exists
+        if items or syncsketch_api.get_review_by_id(
+            cached_review_id, fields={"id"}
+        ) is not None:
+            return {"id": cached_review_id, "items": items}
+        cache.invalidate(server_url, REVIEW_KIND, cache_key)
+
+    review: dict[str, Any] | None = None
+    if review_id:
+        review = syncsketch_api.get_review_by_id(review_id)
+        # Review might have been moved to other project
+        if (
+            review is not None
+            and get_resource_id(review.get("project")) != project_id
+        ):
+            review = None
+
+    if review is None:
+        review = syncsketch_api.get_review_by_name(project_id, label)
+
+    if review is None:
+        return {}
+
+    review["items"] = syncsketch_api.get_review_items(review["id"])
+    cache.set(server_url, REVIEW_KIND, cache_key, review["id"])
+    return review
+
+
+def _find_sketch_review_again(
+    syncsketch_api: SyncSketchAPI,
+    project_id: int,
+    list_id: str,
+    label: str,
+) -> dict[str, Any]:
+    """Find review again when SyncSketch did not find the resolved one."""
+    get_default_resolution_cache().invalidate(
+        syncsketch_api.server_url, REVIEW_KIND, (project_id, list_id)
+    )
+    return _find_sketch_review(
+        syncsketch_api, project_id, list_id, None, label
+    )
+
+
+def _create_sketch_review(
+    syncsketch_api: SyncSketchAPI,
+    project_id: int,
+    list_id: str,
+    label: str,
+    sketch_project: str,
+) -> dict[str, Any]:
+    try:
+        sketch_review = syncsketch_api.create_review(project_id, label)
+    except requests.HTTPError:
+        # Cached project might not exist anymore
+        get_default_resolution_cache().invalidate(
+            syncsketch_api.server_url,
+            PROJECT_KIND,
+            sketch_project.lower(),
+        )
+        raise
+    get_default_resolution_cache().set(
+        syncsketch_api.server_url,
+        REVIEW_KIND,
+        (project_id, list_id),
+        sketch_review["id"],
+    )
+    logging.info(
+        f"Created review session '{label}'"
+        f" in SyncSketch project '{sketch_project}'"
+    )
+    return sketch_review
+
+
+def _create_sketch_review_item(
+    syncsketch_api: SyncSketchAPI,
+    review_id: int,
+    name: str,
+    stream: io.BytesIO | None,
+    media_url: str | None,
+) -> dict[str, Any]:
+    """Upload stream or add media url to SyncSketch review."""
+    if stream is None:
+        return syncsketch_api.create_review_item_from_url(
+            review_id=review_id,
+            media_url=media_url,
+            name=name,
+        )
+    # Stream might have been read by previous call
+    stream.seek(0)
+    return syncsketch_api.create_review_item_from_stream(
+        review_id=review_id,
+        stream=stream,
+        name=name,
+    )
+
+
+def _is_not_found_error(exc: Exception) -> bool:
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 404
+
+
 def push_review_to_syncsketch(
     event: dict[str, Any],
     credentials: SyncsketchConfig,
+    job: JobContext,
 ) -> None:
     """Push review to SyncSketch server."""
     project_name = event["project"]
@@ -31,7 +189,10 @@ def push_review_to_syncsketch(
     logging.info(
         f"Pushing review session '{list_id}' from AYON project {project_name}"
     )
-    ayon_list_entity = ayon_api.get_entity_list_rest(project_name, list_id)
+    job.start_phase("ayon_list")
+    ayon_list_entity = measure_call(
+        "ayon", ayon_api.get_entity_list_rest, project_name, list_id
+    )
     if ayon_list_entity is None:
         msg = (
             f"Failed to find list '{list_id}'"
@@ -71,13 +232,14 @@ def push_review_to_syncsketch(
         username=credentials.username,
         api_key=credentials.api_key,
         server_url=credentials.server_url,
+        deadline=job.deadline,
     )
+    job.start_phase("syncsketch_project")
     project_id: int | None = None
-    for project in syncsketch_api.get_projects(fields={"id", "name"}):
-        if project["name"].lower() == sketch_project.lower():
-            project_id = project["id"]
-            sketch_project = project["name"]
-            break
+    project = _find_sketch_project(syncsketch_api, sketch_project)
+    if project is not None:
+        project_id = project["id"]
+        sketch_project = project["name"]
 
     if project_id is None:
         msg = f"Failed to find SyncSketch project '{sketch_project}'"
@@ -86,7 +248,9 @@ def push_review_to_syncsketch(
         # NOTE Right now there is no way how to fix this using UI.
         if sketch_meta_project:
             syncketch_meta.pop("project", None)
-            ayon_api.update_entity_list(
+            measure_call(
+                "ayon",
+                ayon_api.update_entity_list,
                 project_name,
                 list_id,
                 data={"syncsketch": syncketch_meta},
@@ -96,30 +260,14 @@ def push_review_to_syncsketch(
         raise SyncError(msg)
 
     label = ayon_list_entity["label"]
-    sketch_review: dict[str, Any] = {}
-    sketch_review_by_name: dict[str, Any] | None = None
-    for review in syncsketch_api.get_reviews(project_id):
-        if review["id"] == sketch_review_id:
-            sketch_review = review
-            break
-
-        if review["name"] == label:
-            sketch_review_by_name = review
-
-    if not sketch_review and sketch_review_by_name:
-        sketch_review = sketch_review_by_name
-
-    if sketch_review:
-        # Fetch items of the review item
-        sketch_review["items"] = syncsketch_api.get_review_items(
-            sketch_review["id"]
-        )
+    job.start_phase("syncsketch_review")
+    sketch_review: dict[str, Any] = _find_sketch_review(
+        syncsketch_api, project_id, list_id, sketch_review_id, label
+    )
 
-    else:
-        sketch_review = syncsketch_api.create_review(project_id, label)
-        logging.info(
-            f"Created review session '{label}'"
-            f" in SyncSketch project '{sketch_project}'"
+    if not sketch_review:
+        sketch_review = _create_sketch_review(
+            syncsketch_api, project_id, list_id, label, sketch_project
         )
 
     sketch_review_id = sketch_review["id"]
@@ -134,7 +282,10 @@ def push_review_to_syncsketch(
             meta_changed = True
 
     if meta_changed:
-        ayon_api.update_entity_list(
+        job.start_phase("ayon_list_update")
+        measure_call(
+            "ayon",
+            ayon_api.update_entity_list,
             project_name,
             list_id,
             data={"syncsketch": syncketch_meta},
@@ -144,9 +295,14 @@ def push_review_to_syncsketch(
     #   https://github.com/ynput/ayon-backend/issues/985
     # - update of the 'syncsketch_id' field
     syncsketch_ids = {item["id"] for item in sketch_review["items"]}
+    # Items uploaded by previous run of the job
+    pushed_items: dict[str, int] = job.get_done_items("pushedItems")
     new_items = []
     for ayon_item in ayon_list_entity["items"]:
-        syncsketch_id = ayon_item["data"].get("syncsketch_id")
+        syncsketch_id = (
+            ayon_item["data"].get("syncsketch_id")
+            or pushed_items.get(ayon_item["id"])
+        )
         if syncsketch_id not in syncsketch_ids:
             new_items.append(ayon_item)
 
@@ -158,11 +314,16 @@ def push_review_to_syncsketch(
         return
 
     for ayon_item in new_items:
+        job.check_interrupt()
+        job.start_phase("ayon_reviewable")
         version_id = ayon_item["entityId"]
         reviewable_id: str | None = ayon_item["data"].get("reviewable")
         if reviewable_id is None:
-            response = ayon_api.get(
-                f"projects/{project_name}/versions/{version_id}/reviewables")
+            response = measure_call(
+                "ayon",
+                ayon_api.get,
+                f"projects/{project_name}/versions/{version_id}/reviewables",
+            )
             response.raise_for_status()
             reviewable_id = next(
                 (r["fileId"] for r in response.data["reviewables"]),
@@ -176,28 +337,76 @@ def push_review_to_syncsketch(
             )
             continue
 
-        file_info_response = ayon_api.get(
+        file_info_response = measure_call(
+            "ayon",
+            ayon_api.get,
             f"projects/{project_name}/files/{reviewable_id}/info"
         )
         file_info_response.raise_for_status()
         filename = file_info_response.data["filename"]
-        file_response = ayon_api.raw_get(
+        file_response = measure_call(
+            "ayon",
+            ayon_api.raw_get,
             f"projects/{project_name}/files/{reviewable_id}",
             allow_redirects=False
         )
         location = file_response.headers["location"]
+        stream: io.BytesIO | None = None
+        media_url: str | None = None
+        size = 0
         if location.lower().startswith("/api/"):
+            job.start_phase("ayon_download")
             stream = io.BytesIO()
-            ayon_api.download_project_file_to_stream(
+            measure_call(
+                "ayon",
+                ayon_api.download_project_file_to_stream,
                 project_name, reviewable_id, stream
             )
-            stream.seek(0)
+            size = stream.getbuffer().nbytes
+            TRANSFERRED_BYTES.inc(size, service="ayon", direction="download")
+            job.add_phase_bytes(size)
 
-            item = syncsketch_api.create_review_item_from_stream(
-                review_id=sketch_review_id,
-                stream=stream,
-                name=filename,
+        else:
+            media_url = location
+
+        job.start_phase("syncsketch_upload")
+        try:
+            item = _create_sketch_review_item(
+                syncsketch_api, sketch_review_id, filename, stream, media_url
+            )
+        except requests.HTTPError as exc:
+            if not _is_not_found_error(exc):
+                raise
+            # Review might have been deleted after it was resolved
+            logging.warning(
+                f"SyncSketch review '{sketch_review_id}' was not found."
+                " Looking it up again."
+            )
+            sketch_review = _find_sketch_review_again(
+                syncsketch_api, project_id, list_id, label
+            )
+            if not sketch_review:
+                sketch_review = _create_sketch_review(
+                    syncsketch_api, project_id, list_id, label, sketch_project
+                )
+            sketch_review_id = sketch_review["id"]
+            syncketch_meta["id"] = sketch_review_id
+            measure_call(
+                "ayon",
+                ayon_api.update_entity_list,
+                project_name,
+                list_id,
+                data={"syncsketch": syncketch_meta},
+            )
+            item = _create_sketch_review_item(
+                syncsketch_api, sketch_review_id, filename, stream, media_url
             )
+
+        if stream is not None:
+            TRANSFERRED_BYTES.inc(
+                size, service="syncsketch", direction="upload"
+            )
+            job.add_phase_bytes(size)
             logging.info(
                 "Added item by downloading it from AYON and uploading to"
                 f" review session '{label}' in SyncSketch project"
@@ -205,18 +414,16 @@ def push_review_to_syncsketch(
             )
 
         else:
-            media_url = location
-            item = syncsketch_api.create_review_item_from_url(
-                review_id=sketch_review_id,
-                media_url=media_url,
-                name=filename,
-            )
             logging.info(
                 f"Added item with url '{media_url}' to review session"
                 f" '{label}' in SyncSketch project '{sketch_project}'"
             )
 
-        ayon_api.update_entity_list_item(
+        job.start_phase("ayon_list_item_update")
+        job.mark_item_done("pushedItems", ayon_item["id"], item["id"])
+        measure_call(
+            "ayon",
+            ayon_api.update_entity_list_item,
             project_name,
             list_id,
             ayon_item["id"],
@@ -229,6 +436,7 @@ def push_review_to_syncsketch(
 def pull_comment_from_syncsketch(
     event: dict[str, Any],
     credentials: SyncsketchConfig,
+    job: JobContext,
 ) -> None:
     project_name = event["project"]
     list_id = event["summary"]["listId"]
@@ -238,7 +446,10 @@ def pull_comment_from_syncsketch(
         f" for list '{list_id}' in project {project_name}"
     )
     # --- Validate AYON list data ---
-    ayon_list_entity: dict[str, Any] = ayon_api.get_entity_list_rest(
+    job.start_phase("ayon_list")
+    ayon_list_entity: dict[str, Any] = measure_call(
+        "ayon",
+        ayon_api.get_entity_list_rest,
         project_name, list_id
     )
     if ayon_list_entity is None:
@@ -286,12 +497,13 @@ def pull_comment_from_syncsketch(
         username=credentials.username,
         api_key=credentials.api_key,
         server_url=credentials.server_url,
+        deadline=job.deadline,
     )
+    job.start_phase("syncsketch_project")
     project_id: int | None = None
-    for project in syncsketch_api.get_projects(fields={"id", "name"}):
-        if project["name"].lower() == sketch_project.lower():
-            project_id = project["id"]
-            break
+    project = _find_sketch_project(syncsketch_api, sketch_project)
+    if project is not None:
+        project_id = project["id"]
 
     if project_id is None:
         raise SyncError(
@@ -299,26 +511,10 @@ def pull_comment_from_syncsketch(
         )
 
     label: str = ayon_list_entity["label"]
-    sketch_review: dict[str, Any] = {}
-    sketch_review_by_name: dict[str, Any] | None = None
-    for review in syncsketch_api.get_reviews(project_id):
-        if review["id"] == sketch_review_id:
-            sketch_review = review
-            break
-        if review["name"] == label:
-            sketch_review_by_name = review
-
-    if not sketch_review and sketch_review_by_name:
-        sketch_review = sketch_review_by_name
-
-    if sketch_review:
-        # Items are not included when 'get_reviews' is called
-        # - it can be included in the review, but the payload would
-        #   be huge and we don't need it for the all reviews
-        sketch_review["items"] = syncsketch_api.get_review_items(
-            sketch_review["id"]
-        )
-
+    job.start_phase("syncsketch_review")
+    sketch_review: dict[str, Any] = _find_sketch_review(
+        syncsketch_api, project_id, list_id, sketch_review_id, label
+    )
     if not sketch_review:
         raise SyncError(
             f"Failed to find SyncSketch review session with name '{label}'"
@@ -344,11 +540,14 @@ def pull_comment_from_syncsketch(
         )
 
     # Prepare existing AYON activities to avoid duplicated comments
+    job.start_phase("ayon_activities")
     activities_by_entity_id = {
         entity_id: []
         for entity_id in ayon_item_entity_ids
     }
-    for activity in ayon_api.get_activities(
+    for activity in measure_call(
+        "ayon",
+        ayon_api.get_activities,
         project_name,
         entity_ids=ayon_item_entity_ids,
     ):
@@ -359,6 +558,7 @@ def pull_comment_from_syncsketch(
     # - the mapping is based on email, in that case mentions in SyncSketch
     #   comments can be replaced with AYON mentions
     # - also the comments creation can be done inbehalve of the user
+    job.start_phase("users")
     sketch_users_by_email: dict[str, str] = {}
     users = syncsketch_api.get_project_users(project_id)
     for user in users:
@@ -369,19 +569,25 @@ def pull_comment_from_syncsketch(
         sketch_users_by_email[email] = full_name
 
     ayon_users_by_email: dict[str, dict[str, Any]] = {}
-    for user in ayon_api.get_users():
+    for user in measure_call("ayon", ayon_api.get_users):
         email = user["attrib"]["email"]
         if not email:
             continue
         email = email.lower()
         ayon_users_by_email[email] = user
 
-    con = ayon_api.get_server_api_connection()
+    # Use connection of current thread as 'as_username' changes its state
+    con = get_thread_ayon_connection()
 
     ayon_entity_type = "version"
+    # Items synchronized by previous run of the job
+    pulled_items: dict[str, bool] = job.get_done_items("pulledItems")
     # Process each mapped item
     for sketch_item, ayon_item in mapped_items:
+        job.check_interrupt()
         sketch_item_id: int = sketch_item["id"]
+        if str(sketch_item_id) in pulled_items:
+            continue
         ayon_entity_id: str = ayon_item["entityId"]
         ayon_activities_by_sketch_id: dict[int, dict[str, Any]] = {}
         ayon_sketch_activities: list[dict[str, Any]] = []
@@ -397,10 +603,12 @@ def pull_comment_from_syncsketch(
             elif syncsketch_meta["type"] == "sketch":
                 ayon_sketch_activities.append(activity)
 
+        job.start_phase("syncsketch_frames")
         frames_info = syncsketch_api.get_review_item_frames(sketch_item_id)
         # Sort frame items by load time (epoch time used for sorting)
         frames_info.sort(key=lambda f: f["loadTime"])
 
+        job.start_phase("ayon_comments")
         sketches: list[dict[str, Any]] = []
         # Go through frame items and create/update AYON comment activities
         # - also prepare sketche information
@@ -459,7 +667,9 @@ def pull_comment_from_syncsketch(
                 with con.as_username(
                     ayon_username, ignore_service_error=True
                 ):
-                    ayon_api.update_activity(
+                    measure_call(
+                        "ayon",
+                        con.update_activity,
                         project_name,
                         ayon_activity["id"],
                         body=ayon_text,
@@ -478,7 +688,9 @@ def pull_comment_from_syncsketch(
             with con.as_username(
                 ayon_username, ignore_service_error=True
             ):
-                ayon_api.create_activity(
+                measure_call(
+                    "ayon",
+                    con.create_activity,
                     project_name,
                     ayon_entity_id,
                     ayon_entity_type,
@@ -494,6 +706,7 @@ def pull_comment_from_syncsketch(
                 "No sketches found."
                 f" Sync of item '{sketch_item_id}' finished."
             )
+            job.mark_item_done("pulledItems", sketch_item_id, True)
             continue
 
         last_load_time: int = 0
@@ -534,11 +747,34 @@ def pull_comment_from_syncsketch(
                 "Sketches already synchronized."
                 f" Sync of item '{sketch_item_id}' finished."
             )
+            job.mark_item_done("pulledItems", sketch_item_id, True)
             continue
 
-        sketches_data = syncsketch_api.prepare_review_item_sketches(
-            sketch_review_id, sketch_item["id"]
-        )
+        job.start_phase("syncsketch_sketches")
+        try:
+            sketches_data = syncsketch_api.prepare_review_item_sketches(
+                sketch_review_id, sketch_item["id"]
+            )
+        except requests.HTTPError as exc:
+            if not _is_not_found_error(exc):
+                raise
+            # Review might have been deleted after it was resolved
+            logging.warning(
+                f"SyncSketch review '{sketch_review_id}' was not found."
+                " Looking it up again."
+            )
+            sketch_review = _find_sketch_review_again(
+                syncsketch_api, project_id, list_id, label
+            )
+            if not sketch_review:
+                raise SyncError(
+                    "Failed to find SyncSketch review session with name"
+                    f" '{label}' in project '{sketch_project}'"
+                )
+            sketch_review_id = sketch_review["id"]
+            sketches_data = syncsketch_api.prepare_review_item_sketches(
+                sketch_review_id, sketch_item["id"]
+            )
         if sketches_data is None:
             logging.error(
                 f"Failed to sync sketch frames for SyncSketch review"
@@ -548,20 +784,34 @@ def pull_comment_from_syncsketch(
 
         file_ids: set[str] = set()
         for image in sketches_data:
+            job.start_phase("syncsketch_download")
             url = image["url"]
-            with urllib.request.urlopen(url) as response:
+            with urllib.request.urlopen(
+                url, timeout=job.deadline.timeout()
+            ) as response:
                 content = response.read()
+            TRANSFERRED_BYTES.inc(
+                len(content), service="syncsketch", direction="download"
+            )
+            job.add_phase_bytes(len(content))
 
             stream = io.BytesIO(content)
             adjusted_frame = image["adjustedFrame"]
 
             filename = f"Frame {adjusted_frame:0>4}.jpg"
 
-            response = ayon_api.upload_project_file_from_stream(
+            job.start_phase("ayon_upload")
+            response = measure_call(
+                "ayon",
+                ayon_api.upload_project_file_from_stream,
                 project_name,
                 stream,
                 filename,
             )
+            TRANSFERRED_BYTES.inc(
+                len(content), service="ayon", direction="upload"
+            )
+            job.add_phase_bytes(len(content))
             file_id: str = response.json()["id"]
             file_ids.add(file_id)
 
@@ -571,8 +821,11 @@ def pull_comment_from_syncsketch(
             "id": f"sketch{sketch_count}",
             "frames": sketches_items,
         }
+        job.start_phase("ayon_sketch_activity")
         dt_object = datetime.fromtimestamp(last_load_time)
-        ayon_api.create_activity(
+        measure_call(
+            "ayon",
+            ayon_api.create_activity,
             project_name,
             ayon_entity_id,
             ayon_entity_type,
@@ -585,6 +838,7 @@ def pull_comment_from_syncsketch(
             },
         )
 
+        job.mark_item_done("pulledItems", sketch_item_id, True)
         logging.info(f"Sync of item '{sketch_item_id}' finished.")
 
     logging.info(f"Pull of review '{sketch_review_id}' is finished.")
@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import bisect
+import inspect
+import re
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+from .tracing import record_span
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+JOB_BUCKETS = (
+    1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0
+)
+_ID_SEGMENT_REGEX = re.compile(r"/(\d+|[0-9a-fA-F-]{16,})(?=/|$)")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = (
+            str(value)
+            .replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace('"', '\\"')
+        )
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def normalize_endpoint(path: str) -> str:
+    """Replace ids in url path so it can be used as metric label."""
+    return _ID_SEGMENT_REGEX.sub("/{id}", path)
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(
+        self, name: str, description: str, label_names: Iterable[str]
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], Any] = {}
+
+    def _get_key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _iter_samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.label_names, key)), value
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for name, labels, value in self._iter_samples():
+            lines.append(
+                f"{name}{_format_labels(labels)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Iterable[str],
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._get_key(labels)
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                item = {
+                    "counts": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+                self._values[key] = item
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                item["counts"][idx] += 1
+            item["sum"] += value
+            item["count"] += 1
+
+    def _iter_samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            items = [
+                (key, list(item["counts"]), item["sum"], item["count"])
+                for key, item in self._values.items()
+            ]
+        for key, counts, total, count in items:
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bucket, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (
+                    f"{self.name}_bucket",
+                    {**labels, "le": _format_value(bucket)},
+                    cumulative,
+                )
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class Registry:
+    """Collection of metrics rendered in Prometheus text format."""
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def counter(
+        self, name: str, description: str, label_names: Iterable[str] = ()
+    ) -> Counter:
+        return self._register(Counter(name, description, label_names))
+
+    def gauge(
+        self, name: str, description: str, label_names: Iterable[str] = ()
+    ) -> Gauge:
+        return self._register(Gauge(name, description, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(
+            Histogram(name, description, label_names, buckets)
+        )
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Add callback updating metrics right before they're rendered."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = Registry()
+PENDING_EVENTS = REGISTRY.gauge(
+    "syncsketch_pending_events",
+    "Number of pending job events.",
+    ["topic"],
+)
+OLDEST_PENDING_EVENT_AGE = REGISTRY.gauge(
+    "syncsketch_oldest_pending_event_age_seconds",
+    "Age of the oldest pending job event.",
+    ["topic"],
+)
+LOOP_HEARTBEAT_AGE = REGISTRY.gauge(
+    "syncsketch_loop_heartbeat_age_seconds",
+    "Seconds since the last iteration of the main loop.",
+)
+CIRCUIT_OPEN = REGISTRY.gauge(
+    "syncsketch_circuit_open",
+    "SyncSketch calls are paused because of outage.",
+)
+RUNNING_JOBS = REGISTRY.gauge(
+    "syncsketch_running_jobs",
+    "Number of jobs running in this processor.",
+    ["topic"],
+)
+JOB_DURATION = REGISTRY.histogram(
+    "syncsketch_job_duration_seconds",
+    "Duration of jobs.",
+    ["topic", "status"],
+    buckets=JOB_BUCKETS,
+)
+JOB_ERRORS = REGISTRY.counter(
+    "syncsketch_job_errors_total",
+    "Number of failed jobs.",
+    ["topic", "kind"],
+)
+TRANSFERRED_BYTES = REGISTRY.counter(
+    "syncsketch_transferred_bytes_total",
+    "Bytes of media transferred by jobs.",
+    ["service", "direction"],
+)
+API_CALL_DURATION = REGISTRY.histogram(
+    "syncsketch_api_call_duration_seconds",
+    "Duration of calls to SyncSketch and AYON.",
+    ["service", "endpoint"],
+)
+API_CALL_ERRORS = REGISTRY.counter(
+    "syncsketch_api_call_errors_total",
+    "Number of failed calls to SyncSketch and AYON.",
+    ["service", "endpoint"],
+)
+API_CALL_RETRIES = REGISTRY.counter(
+    "syncsketch_api_call_retries_total",
+    "Number of repeated calls to SyncSketch after transient errors.",
+    ["service", "endpoint"],
+)
+RATE_LIMIT_WAIT = REGISTRY.histogram(
+    "syncsketch_rate_limit_wait_seconds",
+    "Time spent waiting for SyncSketch rate limit.",
+    ["call_type"],
+)
+
+
+def _get_response_size(response: Any) -> int | None:
+    content = getattr(response, "content", None)
+    if isinstance(content, (bytes, str)):
+        return len(content)
+    return None
+
+
+def observe_call(
+    service: str,
+    endpoint: str,
+    duration: float,
+    status: int | str | None = None,
+    method: str | None = None,
+    request_size: int | None = None,
+    response_size: int | None = None,
+) -> None:
+    """Measure finished call to a service and record its span.
+
+    Args:
+        service (str): Called service, 'syncsketch' or 'ayon'.
+        endpoint (str): Endpoint or function that was called.
+        duration (float): Duration of the call in seconds.
+        status (int | str | None): Status code of response or 'error'
+            if call failed without response.
+        method (str | None): HTTP method.
+        request_size (int | None): Size of request body in bytes.
+        response_size (int | None): Size of response body in bytes.
+
+    """
+    API_CALL_DURATION.observe(duration, service=service, endpoint=endpoint)
+    if status == "error" or (isinstance(status, int) and status >= 400):
+        API_CALL_ERRORS.inc(service=service, endpoint=endpoint)
+    record_span(
+        service,
+        endpoint,
+        duration,
+        status=status,
+        method=method,
+        request_size=request_size,
+        response_size=response_size,
+    )
+
+
+def measure_call(
+    service: str, func: Callable[..., Any], *args, **kwargs
+) -> Any:
+    """Call function and measure it as a call to a service.
+
+    Calls returning generator are measured until the generator is
+    exhausted.
+
+    Args:
+        service (str): Service label of measured call.
+        func (Callable[..., Any]): Function calling the service, its name
+            is used as endpoint label.
+        *args: Positional arguments of the function.
+        **kwargs: Keyword arguments of the function.
+
+    Returns:
+        Any: Result of the function.
+
+    """
+    name = func.__name__
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception:
+        observe_call(
+            service, name, time.perf_counter() - start, status="error"
+        )
+        raise
+
+    if inspect.isgenerator(result):
+        return _iter_measured(service, name, result, start)
+    observe_call(
+        service,
+        name,
+        time.perf_counter() - start,
+        status=getattr(result, "status_code", None),
+        response_size=_get_response_size(result),
+    )
+    return result
+
+
+def _iter_measured(
+    service: str, name: str, generator: Iterator[Any], start: float
+) -> Iterator[Any]:
+    # Time spent by consumer between items is not measured
+    duration = time.perf_counter() - start
+    status = None
+    try:
+        while True:
+            item_start = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                break
+            finally:
+                duration += time.perf_counter() - item_start
+            yield item
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        observe_call(service, name, duration, status=status)
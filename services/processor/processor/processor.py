@@ -1,148 +1,858 @@
 from __future__ import annotations
 
 import atexit
+import json
 import logging
+import os
 import signal
 import sys
 import threading
 import time
 import traceback
+from typing import Any
 
 import ayon_api
+import requests
 
+from .circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    get_default_circuit_breaker,
+    set_default_circuit_breaker,
+)
+from .credentials import CredentialsCache
+from .deadline import Deadline, DeadlineExceeded
 from .lib import (
-    SyncsketchConfig,
-    get_syncsketch_config,
-    get_syncksketch_settings,
-    validate_syncsketch_credentials,
+    get_env_float,
+    get_env_int,
+    get_env_list,
+    get_event_summary,
 )
 from .logic import (
     push_review_to_syncsketch,
     pull_comment_from_syncsketch,
     SyncError,
 )
+from .event_source import EventSource, EventWakeup, WebsocketEventSource
+from .jobs import JobContext, JobInterrupted, LeaseLost
+from .leases import Lease, LeaseManager, create_worker_id, parse_event_time
+from .metrics import (
+    CIRCUIT_OPEN,
+    JOB_DURATION,
+    JOB_ERRORS,
+    LOOP_HEARTBEAT_AGE,
+    OLDEST_PENDING_EVENT_AGE,
+    PENDING_EVENTS,
+    REGISTRY,
+    RUNNING_JOBS,
+)
+from .profiling import JobProfiler
+from .rate_limit import create_rate_limiter, set_default_rate_limiter
+from .resolution_cache import ResolutionCache, set_default_resolution_cache
+from .scheduler import FairScheduler, get_event_priority
+from .status_server import StatusServer
+from .syncsketch_api import RetryPolicy, SyncSketchAPI
+from .tracing import SpanExporter, set_exporter, span_context
+from .workers import WorkersPool
+
+PUSH_TOPIC = "syncsketch.push.review"
+PULL_TOPIC = "syncsketch.pull.review"
+JOB_TOPICS = [
+    PUSH_TOPIC,
+    PULL_TOPIC,
+]
+# Maximum number of events of a topic processed at the same time
+# - pushes transfer media, pulls mostly read small json data
+TOPIC_MAX_WORKERS_ENV_KEYS = {
+    PUSH_TOPIC: "SYNCSKETCH_PUSH_MAX_WORKERS",
+    PULL_TOPIC: "SYNCSKETCH_PULL_MAX_WORKERS",
+}
+DEFAULT_TOPIC_MAX_WORKERS = {
+    PUSH_TOPIC: 2,
+    PULL_TOPIC: 4,
+}
+# Default for topics without explicit value
+MAX_WORKERS_ENV_KEY = "SYNCSKETCH_PROCESSOR_MAX_WORKERS"
+# Seconds after which SyncSketch credentials are validated again
+CREDENTIALS_TTL_ENV_KEY = "SYNCSKETCH_CREDENTIALS_TTL"
+DEFAULT_CREDENTIALS_TTL = 300
+# Events after which credentials are validated right away
+CREDENTIALS_CHANGE_TOPICS = ["settings.changed"]
+# Number of oldest pending events of a topic considered for claiming
+CLAIM_WINDOW_ENV_KEY = "SYNCSKETCH_CLAIM_WINDOW"
+DEFAULT_CLAIM_WINDOW = 50
+# Minimum seconds between scans of pending events beyond claim window
+PENDING_COUNT_INTERVAL = 30
+# Pending events of each project fetched when claim window is full
+PROJECT_CLAIM_WINDOW = 5
+# Fields of pending events needed for claiming
+CLAIM_EVENT_FIELDS = {"id", "project", "retries", "summary", "createdAt"}
+# Source of event notifications 'websocket' or 'polling'
+EVENT_SOURCE_ENV_KEY = "SYNCSKETCH_EVENT_SOURCE"
+POLL_INTERVAL_ENV_KEY = "SYNCSKETCH_POLL_INTERVAL"
+DEFAULT_POLL_INTERVAL = 10
+# Poll interval used while event source is connected
+FALLBACK_POLL_INTERVAL = 60
+# Seconds without heartbeat after which claimed event can be reclaimed
+LEASE_TIMEOUT_ENV_KEY = "SYNCSKETCH_LEASE_TIMEOUT"
+DEFAULT_LEASE_TIMEOUT = 120
+# Seconds without heartbeat after which 'in_progress' event is requeued
+STALE_EVENT_AGE_ENV_KEY = "SYNCSKETCH_STALE_EVENT_AGE"
+# Maximum unfinished attempts of an event before it is marked as failed
+MAX_ATTEMPTS_ENV_KEY = "SYNCSKETCH_MAX_ATTEMPTS"
+DEFAULT_MAX_ATTEMPTS = 5
+# Seconds to wait for running jobs on shutdown before they're interrupted
+DRAIN_TIMEOUT_ENV_KEY = "SYNCSKETCH_DRAIN_TIMEOUT"
+DEFAULT_DRAIN_TIMEOUT = 60
+# Seconds to wait for interrupted jobs to store their state
+INTERRUPT_TIMEOUT = 15
+# Port of HTTP server with Prometheus metrics and health endpoints,
+#   disabled if not set
+METRICS_PORT_ENV_KEY = "SYNCSKETCH_METRICS_PORT"
+# Directory where profiles of jobs are stored, profiling is disabled
+#   if not set
+PROFILE_DIR_ENV_KEY = "SYNCSKETCH_PROFILE_DIR"
+# Fraction of matching jobs that are profiled
+PROFILE_SAMPLE_RATE_ENV_KEY = "SYNCSKETCH_PROFILE_SAMPLE_RATE"
+# Comma separated project name and topic patterns of profiled jobs
+PROFILE_PROJECTS_ENV_KEY = "SYNCSKETCH_PROFILE_PROJECTS"
+PROFILE_TOPICS_ENV_KEY = "SYNCSKETCH_PROFILE_TOPICS"
+# File where spans of slow calls are written, tracing is disabled
+#   if not set
+TRACE_FILE_ENV_KEY = "SYNCSKETCH_TRACE_FILE"
+# Minimum duration of traced calls in milliseconds
+TRACE_SLOW_THRESHOLD_ENV_KEY = "SYNCSKETCH_TRACE_SLOW_THRESHOLD"
+DEFAULT_TRACE_SLOW_THRESHOLD = 1000
+# Time budget of a job in seconds, job fails when it runs out
+JOB_TIMEOUT_ENV_KEY = "SYNCSKETCH_JOB_TIMEOUT"
+DEFAULT_JOB_TIMEOUT = 7200
+# SyncSketch calls per second by type of call, '0' disables the limit
+RATE_LIMIT_ENV_KEYS = {
+    "read": "SYNCSKETCH_RATE_LIMIT_READ",
+    "write": "SYNCSKETCH_RATE_LIMIT_WRITE",
+    "upload": "SYNCSKETCH_RATE_LIMIT_UPLOAD",
+}
+DEFAULT_RATE_LIMITS = {
+    "read": 10.0,
+    "write": 5.0,
+    "upload": 1.0,
+}
+# Directory with rate limits state shared by replicas, e.g. on a shared
+#   volume, limits are shared only by threads if not set
+RATE_LIMIT_DIR_ENV_KEY = "SYNCSKETCH_RATE_LIMIT_DIR"
+# Consecutive failed SyncSketch calls after which claiming is paused
+BREAKER_THRESHOLD_ENV_KEY = "SYNCSKETCH_BREAKER_THRESHOLD"
+DEFAULT_BREAKER_THRESHOLD = 5
+# Seconds between checks if SyncSketch is available again
+BREAKER_PROBE_INTERVAL_ENV_KEY = "SYNCSKETCH_BREAKER_PROBE_INTERVAL"
+DEFAULT_BREAKER_PROBE_INTERVAL = 30
+# Seconds after which running job is considered stuck, job timeout with
+#   margin for calls not limited by the job budget by default
+JOB_STUCK_TIMEOUT_ENV_KEY = "SYNCSKETCH_JOB_STUCK_TIMEOUT"
+JOB_STUCK_MARGIN = 600
+# Seconds for which resolved SyncSketch project and review ids are reused
+RESOLUTION_CACHE_TTL_ENV_KEY = "SYNCSKETCH_RESOLUTION_CACHE_TTL"
+DEFAULT_RESOLUTION_CACHE_TTL = 600
+RESOLUTION_CACHE_SIZE_ENV_KEY = "SYNCSKETCH_RESOLUTION_CACHE_SIZE"
+DEFAULT_RESOLUTION_CACHE_SIZE = 1024
+# Main loop is considered stuck after this many of its longest waits
+LOOP_STUCK_FACTOR = 3
 
 
 class SyncSketchContext:
-    credentials: SyncsketchConfig | None = None
-    last_credentials: SyncsketchConfig | None = None
-    credentials_valid: bool = False
-    last_validation_time: float = 0.0
+    credentials_cache: CredentialsCache | None = None
+    last_warning_time: float = 0.0
 
 
 class _GlobalContext:
     stop_event: threading.Event = threading.Event()
+    # Running jobs should stop at the next checkpoint
+    interrupt_event: threading.Event = threading.Event()
     process_cleaned_up: bool = False
     syncsketch: SyncSketchContext = SyncSketchContext()
+    workers_pools: dict[str, WorkersPool] = {}
+    event_wakeup: EventWakeup = EventWakeup()
+    event_source: EventSource | None = None
+    poll_interval: int = DEFAULT_POLL_INTERVAL
+    lease_manager: LeaseManager | None = None
+    scheduler: FairScheduler = FairScheduler()
+    claim_window: int = DEFAULT_CLAIM_WINDOW
+    pending_counts: dict[str, int] = {}
+    pending_counted_at: dict[str, float] = {}
+    # Projects with pending events and ids of pending events with the
+    #   highest priority by topic, found by the last scan of the backlog
+    pending_projects: dict[str, set[str]] = {}
+    pending_priority_ids: dict[str, list[str]] = {}
+    status_server: StatusServer | None = None
+    loop_heartbeat: float = 0.0
+    # Creation time of the oldest pending event by topic
+    oldest_pending_at: dict[str, float | None] = {}
+    job_stuck_timeout: int = DEFAULT_JOB_TIMEOUT + JOB_STUCK_MARGIN
+    job_timeout: int = DEFAULT_JOB_TIMEOUT
+    profiler: JobProfiler | None = None
+    span_exporter: SpanExporter | None = None
 
 
 def _context_has_valid_credentials() -> bool:
     """Make sure SyncSketch credentials are valid."""
     syncsketch = _GlobalContext.syncsketch
-    if syncsketch.credentials_valid:
+    credentials_cache = syncsketch.credentials_cache
+    if credentials_cache.is_valid:
+        syncsketch.last_warning_time = 0.0
         return True
 
-    settings = get_syncksketch_settings()
-    config = get_syncsketch_config(settings)
-    if validate_syncsketch_credentials(config):
-        syncsketch.credentials = config
-        syncsketch.credentials_valid = True
-        return True
-
-    addon_version = ayon_api.get_service_addon_version()
-    sleep_time = 5
-    if syncsketch.last_validation_time == 0.0:
-        logging.warning(
-            "SyncSketch credentials are not set or invalid."
-            " Please check settings"
-            f" of syncksketch {addon_version}."
-        )
-    elif time.time() - syncsketch.last_validation_time > 60:
-        logging.warning(
-            "SyncSketch credentials are still not valid."
-            " Please check settings"
-            f" of syncksketch {addon_version}."
-        )
-        sleep_time = 30
+    # Don't warn before first validation finished
+    if credentials_cache.validated_at != 0.0:
+        addon_version = ayon_api.get_service_addon_version()
+        if syncsketch.last_warning_time == 0.0:
+            syncsketch.last_warning_time = time.time()
+            logging.warning(
+                "SyncSketch credentials are not set or invalid."
+                " Please check settings"
+                f" of syncksketch {addon_version}."
+            )
+        elif time.time() - syncsketch.last_warning_time > 60:
+            syncsketch.last_warning_time = time.time()
+            logging.warning(
+                "SyncSketch credentials are still not valid."
+                " Please check settings"
+                f" of syncksketch {addon_version}."
+            )
 
-    syncsketch.last_validation_time = time.time()
-    while True:
-        if _GlobalContext.stop_event.is_set():
-            break
-        diff = time.time() - syncsketch.last_validation_time
-        if diff > sleep_time:
+    # Wait for validation running in background
+    start = time.time()
+    while not _GlobalContext.stop_event.is_set():
+        if credentials_cache.wait_for_validation(1):
+            return True
+        if time.time() - start > 30:
             break
-        time.sleep(1)
     return False
 
 
-def listen_for_events():
-    while not _GlobalContext.stop_event.is_set():
-        if not _context_has_valid_credentials():
-            continue
+def _is_unauthorized_error(exc: Exception) -> bool:
+    response = getattr(exc, "response", None)
+    status_code = getattr(response, "status_code", None)
+    return status_code in (401, 403)
 
-        job_events = list(ayon_api.get_events(
-            [
-                "syncsketch.push.review",
-                "syncsketch.pull.review",
-            ],
-            statuses={"pending"},
-        ))
-        if not job_events:
-            time.sleep(10)
-            continue
 
-        first_event = job_events[0]
-        # Use rest endpoint to get the event data
-        job_event = ayon_api.get_event(first_event["id"])
-        ayon_api.update_event(
-            job_event["id"],
-            status="in_progress",
-        )
+def _is_syncsketch_outage_error(exc: Exception) -> bool:
+    """Job failed because SyncSketch is unavailable."""
+    if isinstance(exc, CircuitOpenError):
+        return True
+    if get_default_circuit_breaker().is_closed:
+        return False
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(exc, "response", None)
+    status_code = getattr(response, "status_code", None)
+    return status_code is not None and status_code >= 500
 
-        description = "Action process finished."
-        new_status = "finished"
-        payload = None
-        try:
-            if job_event["topic"] == "syncsketch.push.review":
-                push_review_to_syncsketch(
-                    job_event, _GlobalContext.syncsketch.credentials
-                )
-
-            elif job_event["topic"] == "syncsketch.pull.review":
-                pull_comment_from_syncsketch(
-                    job_event, _GlobalContext.syncsketch.credentials
-                )
 
+def _process_job_event(job_event: dict[str, Any], lease: Lease) -> None:
+    try:
+        with span_context(eventId=job_event["id"], topic=job_event["topic"]):
+            profiler = _GlobalContext.profiler
+            if profiler is None:
+                _process_leased_job_event(job_event, lease)
             else:
-                description = f"Unknown job event topic: {job_event['topic']}"
-                logging.warning(description)
-                new_status = "failed"
+                with profiler.profile(job_event, lease.attempt):
+                    _process_leased_job_event(job_event, lease)
+    finally:
+        _GlobalContext.lease_manager.release(lease)
+
 
-        except SyncError as exc:
-            description = str(exc)
-            logging.error(description)
+def _process_leased_job_event(
+    job_event: dict[str, Any], lease: Lease
+) -> None:
+    job = JobContext(
+        job_event,
+        _GlobalContext.interrupt_event,
+        Deadline(_GlobalContext.job_timeout),
+        lease,
+    )
+    credentials_cache = _GlobalContext.syncsketch.credentials_cache
+    credentials = credentials_cache.config
+    if job.is_resumed:
+        logging.info(f"Resuming job of event {job_event['id']}.")
+    description = "Action process finished."
+    new_status = "finished"
+    payload = None
+    retries = None
+    start = time.perf_counter()
+    try:
+        if job_event["topic"] == PUSH_TOPIC:
+            push_review_to_syncsketch(
+                job_event, credentials, job
+            )
+
+        elif job_event["topic"] == PULL_TOPIC:
+            pull_comment_from_syncsketch(
+                job_event, credentials, job
+            )
+
+        else:
+            description = f"Unknown job event topic: {job_event['topic']}"
+            logging.warning(description)
             new_status = "failed"
 
-        except Exception:
+    except LeaseLost:
+        # Event was requeued or claimed by other worker, any update would
+        #   overwrite result of the other attempt
+        logging.warning(
+            f"Lease of event {job_event['id']} was lost. Stopping the job"
+            " without storing its result."
+        )
+        new_status = None
+
+    except JobInterrupted:
+        logging.info(
+            f"Job of event {job_event['id']} was interrupted."
+            " Returning it to pending."
+        )
+        new_status = "pending"
+        description = (
+            "Interrupted by processor shutdown. Will continue"
+            " where it stopped."
+        )
+        payload = job.payload
+        # Lease of current attempt can't be claimed again
+        retries = lease.attempt + 1
+
+    except SyncError as exc:
+        description = str(exc)
+        logging.error(description)
+        new_status = "failed"
+        JOB_ERRORS.inc(topic=job_event["topic"], kind="sync_error")
+
+    except DeadlineExceeded as exc:
+        description = str(exc)
+        logging.error(f"Job of event {job_event['id']} timed out. {exc}")
+        new_status = "failed"
+        JOB_ERRORS.inc(topic=job_event["topic"], kind="timeout")
+        # Processed items are stored for inspection, triggering the action
+        #   again skips them because they are already synchronized
+        payload = job.payload
+
+    except Exception as exc:
+        if _is_syncsketch_outage_error(exc):
+            logging.warning(
+                f"Job of event {job_event['id']} stopped because SyncSketch"
+                f" is unavailable. Returning it to pending. {exc}"
+            )
+            new_status = "pending"
+            description = (
+                "SyncSketch is unavailable. Will continue where it"
+                " stopped when SyncSketch is available again."
+            )
+            payload = job.payload
+            # Lease of current attempt can't be claimed again
+            retries = lease.attempt + 1
+
+        else:
             logging.exception(
                 f"Failed to process job event {job_event['id']}"
             )
+            # Credentials might have been rotated
+            if _is_unauthorized_error(exc):
+                credentials_cache.invalidate()
             new_status = "failed"
+            JOB_ERRORS.inc(topic=job_event["topic"], kind="unexpected")
             description = (
                 "Unexpected error occurred during action process."
                 " Check logs for details."
             )
-            payload = job_event["payload"]
+            payload = job.payload
             payload["traceback"] = traceback.format_exc()
 
-        finally:
-            ayon_api.update_event(
-                job_event["id"],
+    finally:
+        # Lost lease means result belongs to other attempt
+        if new_status is not None:
+            JOB_DURATION.observe(
+                time.perf_counter() - start,
+                topic=job_event["topic"],
+                status=new_status,
+            )
+            # Store timing breakdown next to the description
+            if payload is None:
+                payload = job.payload
+            payload["timing"] = job.get_timing()
+            stored = _GlobalContext.lease_manager.finish(
+                lease,
                 status=new_status,
                 description=description,
                 payload=payload,
+                retries=retries,
+            )
+            if not stored:
+                logging.warning(
+                    f"Lease of event {job_event['id']} was lost."
+                    f" Result '{new_status}' is not stored."
+                )
+
+
+def _wait_for_new_events() -> None:
+    poll_interval = _GlobalContext.poll_interval
+    event_source = _GlobalContext.event_source
+    if event_source is not None and event_source.is_connected:
+        poll_interval = max(poll_interval, FALLBACK_POLL_INTERVAL)
+    _GlobalContext.event_wakeup.wait(poll_interval)
+
+
+def _create_event_source() -> EventSource:
+    source_type = os.environ.get(EVENT_SOURCE_ENV_KEY) or "websocket"
+    if source_type == "polling":
+        return EventSource(JOB_TOPICS)
+
+    if source_type != "websocket":
+        logging.warning(
+            f"Unknown event source '{source_type}'. Using 'websocket'."
+        )
+    con = ayon_api.get_server_api_connection()
+    return WebsocketEventSource(
+        con.get_base_url(), con.access_token, JOB_TOPICS
+    )
+
+
+def _coalesce_duplicate_events(
+    job_event: dict[str, Any], pending_events: list[dict[str, Any]]
+) -> set[str]:
+    """Merge pending events of the same list into claimed job event.
+
+    Users may trigger the same action on the same list multiple times
+    before it is processed. The claimed event processes the current state
+    of the list, so the duplicates are finished with pointer to it.
+
+    Only duplicates in the claim window are merged, duplicates outside
+    of it are merged when they get into the window.
+
+    Args:
+        job_event (dict[str, Any]): Claimed job event.
+        pending_events (list[dict[str, Any]]): Pending events of the
+            claim window.
+
+    Returns:
+        set[str]: Ids of merged events.
+
+    """
+    merged_ids = set()
+    list_id = get_event_summary(job_event).get("listId")
+    if not list_id:
+        return merged_ids
+
+    lease_manager = _GlobalContext.lease_manager
+    job_event_id = job_event["id"]
+    for event in pending_events:
+        if (
+            event["id"] == job_event_id
+            or event["project"] != job_event["project"]
+            or get_event_summary(event).get("listId") != list_id
+        ):
+            continue
+
+        lease = lease_manager.acquire(event)
+        if lease is None:
+            continue
+        try:
+            lease_manager.finish(
+                lease,
+                status="finished",
+                description=f"Merged into event {job_event_id}.",
+                payload={"mergedInto": job_event_id},
+            )
+        finally:
+            lease_manager.release(lease)
+        merged_ids.add(event["id"])
+        logging.info(
+            f"Merged duplicated event {event['id']}"
+            f" into event {job_event_id}."
+        )
+    return merged_ids
+
+
+def _count_pending_events(topic: str) -> int:
+    """Count pending events of a topic scanning all of them.
+
+    Scan fetches id, project and summary of every pending event, it also
+    stores projects with pending events and ids of events with the highest
+    priority, so claiming can consider events beyond claim window.
+
+    Returns:
+        int: Number of pending events.
+
+    """
+    events = list(ayon_api.get_events(
+        [topic],
+        statuses={"pending"},
+        fields={"id", "project", "summary", "createdAt"},
+    ))
+    events.sort(key=lambda e: e.get("createdAt") or "")
+    events.sort(key=get_event_priority, reverse=True)
+    _GlobalContext.pending_projects[topic] = {
+        event["project"] for event in events
+    }
+    _GlobalContext.pending_priority_ids[topic] = [
+        event["id"] for event in events[:_GlobalContext.claim_window]
+    ]
+    return len(events)
+
+
+def _update_pending_count(topic: str, fetched_count: int) -> None:
+    """Store number of pending events of a topic for backlog metrics."""
+    if fetched_count < _GlobalContext.claim_window:
+        # All pending events were fetched
+        count = fetched_count
+        _GlobalContext.pending_projects.pop(topic, None)
+        _GlobalContext.pending_priority_ids.pop(topic, None)
+    else:
+        counted_at = _GlobalContext.pending_counted_at.get(topic, 0.0)
+        if time.time() - counted_at < PENDING_COUNT_INTERVAL:
+            return
+        count = _count_pending_events(topic)
+        _GlobalContext.pending_counted_at[topic] = time.time()
+        if count != _GlobalContext.pending_counts.get(topic):
+            logging.info(f"Backlog of '{topic}' is {count} pending events.")
+    _GlobalContext.pending_counts[topic] = count
+
+
+def _fetch_pending_events(topic: str) -> list[dict[str, Any]]:
+    """Fetch pending events of a topic considered for claiming.
+
+    Oldest pending events within claim window are fetched. When there are
+    more pending events, the window can be filled by a single busy
+    project, so few events of other projects with pending events and
+    events with the highest priority found by the last scan are added.
+
+    Returns:
+        list[dict[str, Any]]: Pending events with fields needed for
+            scheduling.
+
+    """
+    job_events = list(ayon_api.get_events(
+        [topic],
+        statuses={"pending"},
+        fields=CLAIM_EVENT_FIELDS,
+        limit=_GlobalContext.claim_window,
+    ))
+    try:
+        _update_pending_count(topic, len(job_events))
+    except Exception:
+        logging.warning(
+            f"Failed to count pending '{topic}' events.", exc_info=True
+        )
+    if len(job_events) < _GlobalContext.claim_window:
+        return job_events
+
+    event_ids = {event["id"] for event in job_events}
+    fetched_projects = {event["project"] for event in job_events}
+    project_names = (
+        _GlobalContext.pending_projects.get(topic, set()) - fetched_projects
+    )
+    priority_ids = [
+        event_id
+        for event_id in _GlobalContext.pending_priority_ids.get(topic, [])
+        if event_id not in event_ids
+    ]
+    try:
+        extra_events = []
+        for project_name in sorted(project_names):
+            extra_events.extend(ayon_api.get_events(
+                [topic],
+                project_names=[project_name],
+                statuses={"pending"},
+                fields=CLAIM_EVENT_FIELDS,
+                limit=PROJECT_CLAIM_WINDOW,
+            ))
+        if priority_ids:
+            extra_events.extend(ayon_api.get_events(
+                [topic],
+                event_ids=priority_ids,
+                statuses={"pending"},
+                fields=CLAIM_EVENT_FIELDS,
+            ))
+    except Exception:
+        logging.warning(
+            f"Failed to fetch pending '{topic}' events beyond claim window.",
+            exc_info=True,
+        )
+        return job_events
+
+    for event in extra_events:
+        if event["id"] not in event_ids:
+            event_ids.add(event["id"])
+            job_events.append(event)
+    return job_events
+
+
+def _claim_job_events(topic: str, workers_pool: WorkersPool) -> int:
+    """Claim pending events of a topic for free workers of its pool.
+
+    Only pending events returned by '_fetch_pending_events' are fetched
+    with fields needed for scheduling. Full event data are fetched only
+    for claimed events.
+
+    Returns:
+        int: Number of claimed events.
+
+    """
+    job_events = _fetch_pending_events(topic)
+    lease_manager = _GlobalContext.lease_manager
+    scheduler = _GlobalContext.scheduler
+    free_slots = workers_pool.free_slots
+    claimed_ids = set()
+    claimed_count = 0
+    for event in scheduler.order(topic, job_events):
+        if free_slots < 1:
+            break
+        if event["id"] in claimed_ids:
+            # Merged into other claimed event
+            continue
+        lease = lease_manager.acquire(event)
+        if lease is None:
+            # Claimed by other processor
+            claimed_ids.add(event["id"])
+            continue
+        claimed_ids.add(event["id"])
+        scheduler.mark_served(topic, event["project"])
+        try:
+            # Use rest endpoint to get the event data
+            job_event = ayon_api.get_event(event["id"])
+            try:
+                claimed_ids |= _coalesce_duplicate_events(
+                    job_event, job_events
+                )
+            except Exception:
+                logging.warning(
+                    f"Failed to merge duplicates of event {job_event['id']}",
+                    exc_info=True,
+                )
+            workers_pool.submit(_process_job_event, job_event, lease)
+        except Exception:
+            logging.warning(
+                f"Failed to start job of event {event['id']}.",
+                exc_info=True,
             )
+            lease_manager.requeue(lease)
+            continue
+        free_slots -= 1
+        claimed_count += 1
+
+    _GlobalContext.oldest_pending_at[topic] = min(
+        (
+            parse_event_time(event["createdAt"])
+            for event in job_events
+            if event["id"] not in claimed_ids
+        ),
+        default=None,
+    )
+    return claimed_count
+
+
+def _is_syncsketch_available() -> bool:
+    """Check if SyncSketch is available again after outage.
+
+    Cheap call validating credentials is used as trial call of circuit
+    breaker once its reset timeout passes.
+
+    """
+    circuit_breaker = get_default_circuit_breaker()
+    if circuit_breaker.is_closed:
+        return True
+    if circuit_breaker.time_until_trial() > 0:
+        return False
+
+    credentials = _GlobalContext.syncsketch.credentials_cache.config
+    syncsketch_api = SyncSketchAPI(
+        username=credentials.username,
+        api_key=credentials.api_key,
+        server_url=credentials.server_url,
+        retry_policy=RetryPolicy(max_attempts=1),
+    )
+    try:
+        syncsketch_api.validate_credentials()
+    except Exception as exc:
+        logging.info(f"SyncSketch is still unavailable. {exc}")
+    finally:
+        syncsketch_api.close()
+    return circuit_breaker.is_closed
+
+
+def listen_for_events():
+    while not _GlobalContext.stop_event.is_set():
+        _GlobalContext.loop_heartbeat = time.time()
+        if not _context_has_valid_credentials():
+            continue
+
+        if not _is_syncsketch_available():
+            # Don't claim events during outage, so they stay pending
+            _GlobalContext.event_wakeup.wait(max(
+                1.0, get_default_circuit_breaker().time_until_trial()
+            ))
+            continue
+
+        # Clear before query so events dispatched or jobs finished
+        #   meanwhile wake up the loop
+        _GlobalContext.event_wakeup.clear()
+        topic_pools = [
+            (topic, workers_pool)
+            for topic, workers_pool in _GlobalContext.workers_pools.items()
+            if workers_pool.free_slots > 0
+        ]
+        if not topic_pools:
+            # Wait for a free worker
+            _GlobalContext.event_wakeup.wait(_GlobalContext.poll_interval)
+            continue
+
+        claimed_count = 0
+        for topic, workers_pool in topic_pools:
+            claimed_count += _claim_job_events(topic, workers_pool)
+
+        # Pending events might be claimed by other processors or fail
+        #   to be claimed, don't query them again right away
+        if not claimed_count:
+            _wait_for_new_events()
+
+
+def _get_health_state() -> dict[str, Any]:
+    """State of the processor reported by health endpoints."""
+    now = time.time()
+    loop_heartbeat_age = None
+    if _GlobalContext.loop_heartbeat:
+        loop_heartbeat_age = now - _GlobalContext.loop_heartbeat
+    # Loop waits at most for poll interval or for credentials validation
+    loop_stuck_age = LOOP_STUCK_FACTOR * max(
+        _GlobalContext.poll_interval, FALLBACK_POLL_INTERVAL
+    )
+    loop_alive = (
+        loop_heartbeat_age is not None
+        and loop_heartbeat_age < loop_stuck_age
+    )
+
+    oldest_pending_ages = {
+        topic: None if created_at is None else max(0.0, now - created_at)
+        for topic, created_at in _GlobalContext.oldest_pending_at.items()
+    }
+
+    stuck_jobs = []
+    lease_manager = _GlobalContext.lease_manager
+    if lease_manager is not None:
+        for lease in lease_manager.get_leases():
+            job_age = now - lease.acquired_at
+            if job_age > _GlobalContext.job_stuck_timeout:
+                stuck_jobs.append(
+                    {"eventId": lease.event_id, "age": int(job_age)}
+                )
+
+    credentials_cache = _GlobalContext.syncsketch.credentials_cache
+    credentials_valid = False
+    credentials_validated_at = None
+    if credentials_cache is not None:
+        credentials_valid = credentials_cache.is_valid
+        credentials_validated_at = credentials_cache.validated_at or None
+
+    syncsketch_state = get_default_circuit_breaker().state
+    stopping = _GlobalContext.stop_event.is_set()
+    return {
+        "alive": loop_alive and not stuck_jobs,
+        "ready": (
+            loop_alive
+            and credentials_valid
+            and syncsketch_state == "closed"
+            and not stopping
+        ),
+        "stopping": stopping,
+        "loopHeartbeatAge": loop_heartbeat_age,
+        "oldestPendingEventAge": oldest_pending_ages,
+        "pendingEvents": dict(_GlobalContext.pending_counts),
+        "runningJobs": {
+            topic: workers_pool.running_count
+            for topic, workers_pool in _GlobalContext.workers_pools.items()
+        },
+        "stuckJobs": stuck_jobs,
+        "credentials": {
+            "valid": credentials_valid,
+            "validatedAt": credentials_validated_at,
+        },
+        "syncsketchCircuit": syncsketch_state,
+    }
+
+
+def _collect_metrics() -> None:
+    for topic, count in tuple(_GlobalContext.pending_counts.items()):
+        PENDING_EVENTS.set(count, topic=topic)
+    for topic, workers_pool in _GlobalContext.workers_pools.items():
+        RUNNING_JOBS.set(workers_pool.running_count, topic=topic)
+    now = time.time()
+    for topic, created_at in tuple(_GlobalContext.oldest_pending_at.items()):
+        age = 0.0 if created_at is None else max(0.0, now - created_at)
+        OLDEST_PENDING_EVENT_AGE.set(age, topic=topic)
+    if _GlobalContext.loop_heartbeat:
+        LOOP_HEARTBEAT_AGE.set(now - _GlobalContext.loop_heartbeat)
+    CIRCUIT_OPEN.set(0 if get_default_circuit_breaker().is_closed else 1)
+
+
+def _metrics_route() -> tuple[int, str, str]:
+    return 200, "text/plain; version=0.0.4; charset=utf-8", REGISTRY.render()
+
+
+def _health_route(key: str) -> tuple[int, str, str]:
+    state = _get_health_state()
+    status_code = 200 if state[key] else 503
+    return status_code, "application/json", json.dumps(state) + "\n"
+
+
+def _create_profiler() -> JobProfiler | None:
+    output_dir = os.environ.get(PROFILE_DIR_ENV_KEY)
+    if not output_dir:
+        return None
+    profiler = JobProfiler(
+        output_dir,
+        sample_rate=get_env_float(PROFILE_SAMPLE_RATE_ENV_KEY, 1.0),
+        projects=get_env_list(PROFILE_PROJECTS_ENV_KEY),
+        topics=get_env_list(PROFILE_TOPICS_ENV_KEY),
+    )
+    logging.info(f"Profiles of jobs are stored to '{output_dir}'.")
+    return profiler
+
+
+def _create_span_exporter() -> SpanExporter | None:
+    path = os.environ.get(TRACE_FILE_ENV_KEY)
+    if not path:
+        return None
+    slow_threshold = get_env_int(
+        TRACE_SLOW_THRESHOLD_ENV_KEY, DEFAULT_TRACE_SLOW_THRESHOLD
+    )
+    try:
+        exporter = SpanExporter(path, slow_threshold=slow_threshold / 1000)
+    except OSError:
+        logging.warning(
+            f"Failed to open trace file '{path}'.", exc_info=True
+        )
+        return None
+    logging.info(
+        f"Calls slower than {slow_threshold}ms are traced to '{path}'."
+    )
+    return exporter
+
+
+def _start_status_server() -> None:
+    port = get_env_int(METRICS_PORT_ENV_KEY, 0)
+    if port <= 0:
+        return
+    REGISTRY.add_collector(_collect_metrics)
+    status_server = StatusServer(port)
+    status_server.add_route("/metrics", _metrics_route)
+    # Liveness fails when main loop or a job is stuck
+    status_server.add_route("/healthz", lambda: _health_route("alive"))
+    # Readiness fails while processor can't process events
+    status_server.add_route("/readyz", lambda: _health_route("ready"))
+    try:
+        status_server.start()
+    except OSError:
+        logging.warning(
+            f"Failed to start status server on port {port}.", exc_info=True
+        )
+        return
+    _GlobalContext.status_server = status_server
 
 
 def main_loop():
@@ -155,6 +865,37 @@ def main_loop():
     logging.info("Main loop stopped.")
 
 
+def _drain_jobs() -> None:
+    """Wait for running jobs, interrupt them after drain timeout."""
+    workers_pools = list(_GlobalContext.workers_pools.values())
+    drain_timeout = max(
+        0, get_env_int(DRAIN_TIMEOUT_ENV_KEY, DEFAULT_DRAIN_TIMEOUT)
+    )
+    running_count = sum(pool.running_count for pool in workers_pools)
+    if running_count:
+        logging.info(
+            f"Waiting up to {drain_timeout}s for {running_count}"
+            " running jobs to finish."
+        )
+    deadline = time.time() + drain_timeout
+    for workers_pool in workers_pools:
+        workers_pool.wait_for_jobs(max(0.0, deadline - time.time()))
+
+    running_count = sum(pool.running_count for pool in workers_pools)
+    if running_count:
+        logging.warning(
+            f"Interrupting {running_count} running jobs."
+            " They will be resumed by next processor."
+        )
+        _GlobalContext.interrupt_event.set()
+        deadline = time.time() + INTERRUPT_TIMEOUT
+        for workers_pool in workers_pools:
+            workers_pool.wait_for_jobs(max(0.0, deadline - time.time()))
+
+    for workers_pool in workers_pools:
+        workers_pool.shutdown(wait=False)
+
+
 def _cleanup_process():
     """Cleanup timer threads on exit."""
     if _GlobalContext.process_cleaned_up:
@@ -174,6 +915,56 @@ def _cleanup_process():
     logging.info("Stopping main loop.")
     if not _GlobalContext.stop_event.is_set():
         _GlobalContext.stop_event.set()
+    # Wake up listen loop if is waiting for new events
+    _GlobalContext.event_wakeup.notify()
+    if _GlobalContext.event_source is not None:
+        _GlobalContext.event_source.stop()
+
+
+def _get_job_stuck_timeout(job_timeout: int) -> int:
+    """Stuck timeout that does not report healthy long jobs as stuck."""
+    min_timeout = job_timeout + JOB_STUCK_MARGIN
+    stuck_timeout = get_env_int(JOB_STUCK_TIMEOUT_ENV_KEY, min_timeout)
+    if stuck_timeout < min_timeout:
+        logging.warning(
+            f"'{JOB_STUCK_TIMEOUT_ENV_KEY}' is lower than job timeout"
+            f" with margin. Using {min_timeout}s."
+        )
+        stuck_timeout = min_timeout
+    return stuck_timeout
+
+
+def _stop_services() -> None:
+    """Stop background services started by 'main'."""
+    if _GlobalContext.lease_manager is not None:
+        _GlobalContext.lease_manager.stop()
+    credentials_cache = _GlobalContext.syncsketch.credentials_cache
+    if credentials_cache is not None:
+        credentials_cache.stop()
+    if _GlobalContext.status_server is not None:
+        _GlobalContext.status_server.stop()
+    span_exporter = _GlobalContext.span_exporter
+    if span_exporter is not None:
+        _GlobalContext.span_exporter = None
+        set_exporter(None)
+        span_exporter.close()
+
+
+def _exit_now() -> None:
+    """Exit without waiting for running jobs.
+
+    Events of running jobs stay 'in_progress' and are requeued as stale
+    by other processors.
+
+    """
+    logging.warning("Stopping without waiting for running jobs.")
+    try:
+        _stop_services()
+    except Exception:
+        logging.warning("Failed to stop services.", exc_info=True)
+    logging.shutdown()
+    # Worker threads would be joined on 'sys.exit'
+    os._exit(1)
 
 
 def main():
@@ -202,15 +993,110 @@ def main():
 
     # Register interrupt signal
     def signal_handler(sig, frame):
+        # Second signal stops the process without waiting for jobs
+        if _GlobalContext.stop_event.is_set():
+            _exit_now()
+        # Main loop stops claiming new events and drains running jobs
         _cleanup_process()
-        sys.exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     atexit.register(_cleanup_process)
 
     ayon_api.set_sender_type("syncsketch")
+    for topic in JOB_TOPICS:
+        default_max_workers = get_env_int(
+            MAX_WORKERS_ENV_KEY, DEFAULT_TOPIC_MAX_WORKERS[topic]
+        )
+        max_workers = max(1, get_env_int(
+            TOPIC_MAX_WORKERS_ENV_KEYS[topic], default_max_workers
+        ))
+        logging.info(
+            f"Processing up to {max_workers} '{topic}' events"
+            " at the same time."
+        )
+        _GlobalContext.workers_pools[topic] = WorkersPool(
+            max_workers,
+            name=topic,
+            on_job_done=_GlobalContext.event_wakeup.notify,
+        )
+    _GlobalContext.claim_window = max(
+        1, get_env_int(CLAIM_WINDOW_ENV_KEY, DEFAULT_CLAIM_WINDOW)
+    )
+    _GlobalContext.poll_interval = max(
+        1, get_env_int(POLL_INTERVAL_ENV_KEY, DEFAULT_POLL_INTERVAL)
+    )
+    _GlobalContext.job_timeout = max(
+        1, get_env_int(JOB_TIMEOUT_ENV_KEY, DEFAULT_JOB_TIMEOUT)
+    )
+    _GlobalContext.job_stuck_timeout = _get_job_stuck_timeout(
+        _GlobalContext.job_timeout
+    )
+    _GlobalContext.profiler = _create_profiler()
+    set_default_circuit_breaker(CircuitBreaker(
+        "SyncSketch",
+        failure_threshold=get_env_int(
+            BREAKER_THRESHOLD_ENV_KEY, DEFAULT_BREAKER_THRESHOLD
+        ),
+        reset_timeout=max(1, get_env_int(
+            BREAKER_PROBE_INTERVAL_ENV_KEY, DEFAULT_BREAKER_PROBE_INTERVAL
+        )),
+    ))
+    set_default_rate_limiter(create_rate_limiter(
+        {
+            call_type: get_env_float(env_key, DEFAULT_RATE_LIMITS[call_type])
+            for call_type, env_key in RATE_LIMIT_ENV_KEYS.items()
+        },
+        os.environ.get(RATE_LIMIT_DIR_ENV_KEY),
+    ))
+    set_default_resolution_cache(ResolutionCache(
+        ttl=get_env_int(
+            RESOLUTION_CACHE_TTL_ENV_KEY, DEFAULT_RESOLUTION_CACHE_TTL
+        ),
+        max_size=get_env_int(
+            RESOLUTION_CACHE_SIZE_ENV_KEY, DEFAULT_RESOLUTION_CACHE_SIZE
+        ),
+    ))
+    span_exporter = _create_span_exporter()
+    _GlobalContext.span_exporter = span_exporter
+    set_exporter(span_exporter)
+    _start_status_server()
+    credentials_cache = CredentialsCache(
+        max(1, get_env_int(CREDENTIALS_TTL_ENV_KEY, DEFAULT_CREDENTIALS_TTL))
+    )
+    _GlobalContext.syncsketch.credentials_cache = credentials_cache
+    credentials_cache.start()
+    _GlobalContext.event_source = _create_event_source()
+    _GlobalContext.event_source.subscribe(
+        CREDENTIALS_CHANGE_TOPICS,
+        lambda event: credentials_cache.invalidate(),
+    )
+    _GlobalContext.event_source.start(_GlobalContext.event_wakeup)
+    lease_timeout = max(
+        10, get_env_int(LEASE_TIMEOUT_ENV_KEY, DEFAULT_LEASE_TIMEOUT)
+    )
+    worker_id = create_worker_id()
+    logging.info(f"Processor worker id '{worker_id}'.")
+    _GlobalContext.lease_manager = LeaseManager(
+        JOB_TOPICS,
+        worker_id,
+        lease_timeout=lease_timeout,
+        heartbeat_interval=lease_timeout / 4,
+        stale_age=get_env_int(STALE_EVENT_AGE_ENV_KEY, lease_timeout),
+        max_attempts=max(
+            1, get_env_int(MAX_ATTEMPTS_ENV_KEY, DEFAULT_MAX_ATTEMPTS)
+        ),
+    )
+    # Requeue events left 'in_progress' by crashed processors
+    try:
+        _GlobalContext.lease_manager.reclaim_expired()
+    except Exception:
+        logging.warning("Failed to requeue stale events.", exc_info=True)
+    _GlobalContext.lease_manager.start()
     try:
         main_loop()
     finally:
         _cleanup_process()
+        # Let running jobs finish so their events are not left 'in_progress'
+        _drain_jobs()
+        _stop_services()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import fnmatch
+import logging
+import os
+import random
+import threading
+from typing import Any, Iterable, Iterator
+
+
+def _matches(value: str | None, patterns: list[str]) -> bool:
+    if not patterns:
+        return True
+    if value is None:
+        return False
+    return any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns)
+
+
+class JobProfiler:
+    """Profile selected jobs with cProfile and dump stats to a directory.
+
+    Job is profiled when its project and topic match the filters and it
+    is picked by sampling. Only one job is profiled at a time, jobs
+    started while another job is profiled run without profiler.
+
+    Stats are dumped to '{event id}-{attempt}.prof' and can be viewed
+    e.g. with 'python -m pstats' or 'snakeviz'.
+
+    Args:
+        output_dir (str): Directory where stats are dumped.
+        sample_rate (float): Fraction of matching jobs that are profiled.
+        projects (Iterable[str]): Project name patterns, all projects
+            match if empty.
+        topics (Iterable[str]): Topic patterns, all topics match if empty.
+
+    """
+    def __init__(
+        self,
+        output_dir: str,
+        sample_rate: float = 1.0,
+        projects: Iterable[str] = (),
+        topics: Iterable[str] = (),
+    ) -> None:
+        self._output_dir = output_dir
+        self._sample_rate = min(1.0, max(0.0, sample_rate))
+        self._projects = list(projects)
+        self._topics = list(topics)
+        # cProfile does not support concurrent profilers in all versions
+        self._lock = threading.Lock()
+
+    def should_profile(self, event: dict[str, Any]) -> bool:
+        if not _matches(event.get("project"), self._projects):
+            return False
+        if not _matches(event.get("topic"), self._topics):
+            return False
+        return random.random() < self._sample_rate
+
+    @contextlib.contextmanager
+    def profile(
+        self, event: dict[str, Any], attempt: int = 0
+    ) -> Iterator[None]:
+        """Profile code in context if the event is selected."""
+        if not self.should_profile(event) or not self._lock.acquire(False):
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            # Profile of failed job is dumped too
+            self._dump(profiler, event, attempt)
+            self._lock.release()
+
+    def _dump(
+        self, profiler: cProfile.Profile, event: dict[str, Any], attempt: int
+    ) -> None:
+        path = os.path.join(self._output_dir, f"{event['id']}-{attempt}.prof")
+        try:
+            os.makedirs(self._output_dir, exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError:
+            logging.warning(
+                f"Failed to store profile of event {event['id']}.",
+                exc_info=True,
+            )
+            return
+        logging.info(f"Profile of event {event['id']} stored to '{path}'.")
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class TokenBucket:
+    """Token bucket shared by threads of the process.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float | None): Maximum of tokens that can be spent at
+            once. Same as rate if not set.
+
+    """
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        if capacity is None:
+            capacity = rate
+        self._rate = rate
+        self._capacity = max(1.0, capacity)
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Take a token, wait until one is available.
+
+        Args:
+            timeout (float | None): Maximum seconds to wait.
+
+        Returns:
+            bool: Token was taken.
+
+        """
+        end_time = None
+        if timeout is not None:
+            end_time = time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return True
+            if end_time is not None:
+                remaining = end_time - time.monotonic()
+                if remaining < wait:
+                    return False
+            time.sleep(wait)
+
+    def _try_acquire(self) -> float:
+        """Take a token if available.
+
+        Returns:
+            float: Seconds until next token is available, '0' when token
+                was taken.
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait = self._consume(
+                self._tokens, now - self._updated_at
+            )
+            self._updated_at = now
+            return wait
+
+    def _consume(self, tokens: float, elapsed: float) -> tuple[float, float]:
+        tokens = min(self._capacity, tokens + max(0.0, elapsed) * self._rate)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self._rate
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket with state in a file shared by multiple processes.
+
+    Processes, e.g. processor replicas with shared volume, lock the file
+    when they take a token.
+
+    Args:
+        path (str): Path to state file of the bucket.
+        rate (float): Tokens added per second.
+        capacity (float | None): Maximum of tokens that can be spent at
+            once. Same as rate if not set.
+
+    """
+    def __init__(
+        self, path: str, rate: float, capacity: float | None = None
+    ) -> None:
+        if fcntl is None:
+            raise RuntimeError("File locks are not available on this system")
+        super().__init__(rate, capacity)
+        dirpath = os.path.dirname(path)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        self._path = path
+
+    def _try_acquire(self) -> float:
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            tokens, updated_at = self._read_state(fd, now)
+            tokens, wait = self._consume(tokens, now - updated_at)
+            state = json.dumps({"tokens": tokens, "updatedAt": now})
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, state.encode("utf-8"))
+            return wait
+        finally:
+            # Closing the file releases the lock
+            os.close(fd)
+
+    def _read_state(self, fd: int, now: float) -> tuple[float, float]:
+        os.lseek(fd, 0, os.SEEK_SET)
+        content = b""
+        while True:
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                break
+            content += chunk
+        try:
+            state = json.loads(content)
+            return float(state["tokens"]), float(state["updatedAt"])
+        except (ValueError, KeyError, TypeError):
+            # New or corrupted file starts with full bucket
+            return self._capacity, now
+
+
+class RateLimiter:
+    """Rate limits of calls by type of call.
+
+    Args:
+        buckets (dict[str, TokenBucket]): Bucket by call type. Call types
+            without bucket are not limited.
+
+    """
+    def __init__(self, buckets: dict[str, TokenBucket]) -> None:
+        self._buckets = buckets
+
+    def acquire(self, call_type: str, timeout: float | None = None) -> bool:
+        """Wait until call of the type can be made.
+
+        Returns:
+            bool: Call can be made, False if timeout was reached.
+
+        """
+        bucket = self._buckets.get(call_type)
+        if bucket is None:
+            return True
+        return bucket.acquire(timeout)
+
+
+def create_rate_limiter(
+    rates: dict[str, float], state_dir: str | None = None
+) -> RateLimiter:
+    """Create rate limiter with buckets shared by threads or processes.
+
+    Args:
+        rates (dict[str, float]): Calls per second by call type. Types
+            with rate lower or equal to '0' are not limited.
+        state_dir (str | None): Directory with bucket state files shared
+            by multiple processes.
+
+    Returns:
+        RateLimiter: Rate limiter.
+
+    """
+    if state_dir and fcntl is None:
+        logging.warning(
+            "File locks are not available. Rate limits are shared"
+            " only by threads of this process."
+        )
+        state_dir = None
+
+    buckets: dict[str, TokenBucket] = {}
+    for call_type, rate in rates.items():
+        if rate <= 0:
+            continue
+        if state_dir:
+            buckets[call_type] = FileTokenBucket(
+                os.path.join(state_dir, f"{call_type}.json"), rate
+            )
+        else:
+            buckets[call_type] = TokenBucket(rate)
+    return RateLimiter(buckets)
+
+
+_default_rate_limiter = RateLimiter({})
+
+
+def get_default_rate_limiter() -> RateLimiter:
+    """Rate limiter shared by all SyncSketch clients of the process."""
+    return _default_rate_limiter
+
+
+def set_default_rate_limiter(rate_limiter: RateLimiter) -> None:
+    global _default_rate_limiter
+    _default_rate_limiter = rate_limiter
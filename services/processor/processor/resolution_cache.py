@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import collections
+import threading
+import time
+from typing import Any, Hashable
+
+PROJECT_KIND = "project"
+REVIEW_KIND = "review"
+
+
+class ResolutionCache:
+    """Cache of SyncSketch ids resolved from names, shared by jobs.
+
+    Entries are keyed by SyncSketch server url, so credentials pointing
+    to other server do not use ids of previous server. Entries expire
+    after TTL and least recently used entries are removed when the cache
+    is full.
+
+    Args:
+        ttl (float): Seconds after which entry expires. Cache is disabled
+            when lower or equal to '0'.
+        max_size (int): Maximum number of entries.
+
+    """
+    def __init__(self, ttl: float = 600.0, max_size: int = 1024) -> None:
+        self._ttl = ttl
+        self._max_size = max(1, max_size)
+        self._entries: collections.OrderedDict[
+            tuple[str, str, Hashable], tuple[Any, float]
+        ] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, server_url: str, kind: str, key: Hashable) -> Any | None:
+        """Get cached value.
+
+        Args:
+            server_url (str): SyncSketch server url.
+            kind (str): Kind of resolved value, e.g. 'project'.
+            key (Hashable): Key of value, e.g. project name.
+
+        Returns:
+            Any | None: Cached value or None if not cached or expired.
+
+        """
+        cache_key = (server_url, kind, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return value
+
+    def set(
+        self, server_url: str, kind: str, key: Hashable, value: Any
+    ) -> None:
+        if self._ttl <= 0:
+            return
+        cache_key = (server_url, kind, key)
+        with self._lock:
+            self._entries[cache_key] = (value, time.monotonic() + self._ttl)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, server_url: str, kind: str, key: Hashable) -> None:
+        """Remove entry, e.g. when the object does not exist anymore."""
+        with self._lock:
+            self._entries.pop((server_url, kind, key), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_default_resolution_cache = ResolutionCache()
+
+
+def get_default_resolution_cache() -> ResolutionCache:
+    """Resolution cache shared by all jobs of the process."""
+    return _default_resolution_cache
+
+
+def set_default_resolution_cache(resolution_cache: ResolutionCache) -> None:
+    global _default_resolution_cache
+    _default_resolution_cache = resolution_cache
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import collections
+import threading
+from typing import Any, Iterable
+
+from .lib import get_event_summary
+
+# Events without priority in summary
+DEFAULT_PRIORITY = 0
+
+
+def get_event_priority(event: dict[str, Any]) -> int:
+    """Priority of event from its summary, higher is processed first."""
+    priority = get_event_summary(event).get("priority")
+    try:
+        return int(priority)
+    except (TypeError, ValueError):
+        return DEFAULT_PRIORITY
+
+
+class FairScheduler:
+    """Order pending events by priority and fair share of projects.
+
+    Events with higher priority go first. Events with the same priority
+    are interleaved round-robin across projects, so a project with many
+    pending events does not block other projects. The rotation continues
+    from the project that was served last for the topic.
+
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last_project_by_topic: dict[str, str] = {}
+
+    def order(
+        self, topic: str, events: Iterable[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Order events of a topic in which they should be processed."""
+        events_by_priority: dict[
+            int, dict[str, list[dict[str, Any]]]
+        ] = collections.defaultdict(lambda: collections.defaultdict(list))
+        for event in sorted(events, key=lambda e: e.get("createdAt") or ""):
+            priority = get_event_priority(event)
+            events_by_priority[priority][event["project"]].append(event)
+
+        with self._lock:
+            last_project = self._last_project_by_topic.get(topic)
+
+        output = []
+        for priority in sorted(events_by_priority, reverse=True):
+            events_by_project = events_by_priority[priority]
+            project_names = sorted(events_by_project)
+            # Start with the project after the one served last
+            if last_project is not None:
+                idx = next(
+                    (
+                        idx
+                        for idx, project_name in enumerate(project_names)
+                        if project_name > last_project
+                    ),
+                    0
+                )
+                project_names = project_names[idx:] + project_names[:idx]
+
+            queues = [
+                collections.deque(events_by_project[project_name])
+                for project_name in project_names
+            ]
+            while queues:
+                for queue in tuple(queues):
+                    output.append(queue.popleft())
+                    if not queue:
+                        queues.remove(queue)
+        return output
+
+    def mark_served(self, topic: str, project_name: str) -> None:
+        """Store project of event that was claimed for processing."""
+        with self._lock:
+            self._last_project_by_topic[topic] = project_name
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+# Route handler returns status code, content type and body
+RouteHandler = Callable[[], "tuple[int, str, str]"]
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server: "_HTTPServer"
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        handler = self.server.routes.get(path)
+        if handler is None:
+            self._send(404, "text/plain; charset=utf-8", "Not found\n")
+            return
+
+        try:
+            status_code, content_type, body = handler()
+        except Exception:
+            logging.warning(
+                f"Failed to handle status request '{path}'.", exc_info=True
+            )
+            self._send(500, "text/plain; charset=utf-8", "Error\n")
+            return
+        self._send(status_code, content_type, body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Scrapes would flood the processor log
+        pass
+
+    def _send(self, status_code: int, content_type: str, body: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    routes: dict[str, RouteHandler]
+
+
+class StatusServer:
+    """HTTP server exposing state of the processor, e.g. metrics.
+
+    Server runs in a background thread and uses only standard library,
+    so it works without any connection to outer world.
+
+    Args:
+        port (int): Port to listen on. Random free port is used for '0'.
+        host (str): Interface to listen on.
+
+    """
+    def __init__(self, port: int, host: str = "0.0.0.0") -> None:
+        self._host = host
+        self._port = port
+        self._routes: dict[str, RouteHandler] = {}
+        self._server: _HTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def port(self) -> int:
+        """Port the server listens on."""
+        if self._server is not None:
+            return self._server.server_address[1]
+        return self._port
+
+    def add_route(self, path: str, handler: RouteHandler) -> None:
+        self._routes[path] = handler
+
+    def start(self) -> None:
+        self._server = _HTTPServer((self._host, self._port), _RequestHandler)
+        self._server.routes = self._routes
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="syncsketch-status-server",
+            daemon=True,
+        )
+        self._thread.start()
+        logging.info(f"Status server listens on port {self.port}.")
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
@@ -1,30 +1,188 @@
 from __future__ import annotations
 
+import email.utils
 import io
+import logging
+import random
 import time
-from typing import Any, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+from urllib.parse import urlsplit
 
 import requests
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+from .circuit_breaker import CircuitBreaker, get_default_circuit_breaker
+from .deadline import Deadline, DeadlineExceeded
+from .lib import get_env_int
+from .metrics import (
+    API_CALL_RETRIES,
+    RATE_LIMIT_WAIT,
+    normalize_endpoint,
+    observe_call,
+)
+from .rate_limit import RateLimiter, get_default_rate_limiter
+from .tracing import get_span_attributes, span_context
+
+# Methods that can be repeated without changing the result
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Status codes of errors that may pass when request is repeated
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Status codes of requests rejected before they were processed
+REJECTED_STATUS_CODES = {429, 503}
+# Status codes of errors caused by unavailable server
+OUTAGE_STATUS_CODES = {500, 502, 503, 504}
+# Number of objects requested per page of paginated endpoints
+PAGE_SIZE_ENV_KEY = "SYNCSKETCH_PAGE_SIZE"
+DEFAULT_PAGE_SIZE = 100
+# Maximum number of pages of an endpoint fetched at the same time
+PAGE_PARALLELISM_ENV_KEY = "SYNCSKETCH_PAGE_PARALLELISM"
+DEFAULT_PAGE_PARALLELISM = 4
+# Types of calls with separate rate limits
+READ_CALL = "read"
+WRITE_CALL = "write"
+UPLOAD_CALL = "upload"
 
 
 class SessionClosed(Exception):
     pass
 
 
+@dataclass
+class RetryPolicy:
+    """Policy of repeating requests that failed on transient errors.
+
+    Delay between attempts grows exponentially with full jitter, delay
+    requested by server in 'Retry-After' header is respected.
+
+    Args:
+        max_attempts (int): Maximum number of attempts of a request.
+        base_delay (float): Delay after first failed attempt in seconds.
+        max_delay (float): Maximum delay between attempts in seconds.
+
+    """
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def get_delay(
+        self, attempt: int, response: requests.Response | None = None
+    ) -> float:
+        """Delay before next attempt after failed attempt."""
+        retry_after = None
+        if response is not None:
+            retry_after = _parse_retry_after(
+                response.headers.get("Retry-After")
+            )
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, delay)
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        dt = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, dt.timestamp() - time.time())
+
+
+def get_resource_id(value: Any) -> int | None:
+    """Get id of related object from id, object or resource uri.
+
+    Related objects are returned as resource uri, e.g.
+    '/api/v1/project/123/', or as object, depending on endpoint.
+
+    """
+    if isinstance(value, dict):
+        value = value.get("id")
+    if isinstance(value, str):
+        value = value.rstrip("/").rsplit("/", 1)[-1]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_connect_error(exc: requests.RequestException) -> bool:
+    """Connection failed before any data of request were sent."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.ConnectionError):
+        return False
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
 class SyncSketchAPI:
+    """Client of SyncSketch REST api.
+
+    Args:
+        username (str): SyncSketch username.
+        api_key (str): SyncSketch api key.
+        server_url (str | None): SyncSketch server url.
+        deadline (Deadline | None): Time budget of all calls. Timeout of
+            each request is derived from remaining budget.
+        retry_policy (RetryPolicy | None): Policy of repeating requests
+            failed on transient errors.
+        rate_limiter (RateLimiter | None): Rate limits of calls. Rate
+            limiter shared by the whole process is used if not set.
+        circuit_breaker (CircuitBreaker | None): Circuit breaker pausing
+            calls during SyncSketch outage. Circuit breaker shared by the
+            whole process is used if not set.
+        page_size (int | None): Objects per page of paginated endpoints.
+        page_parallelism (int | None): Maximum number of pages fetched
+            at the same time.
+
+    """
     def __init__(
         self,
         username: str,
         api_key: str,
         *,
         server_url: str | None = None,
+        deadline: Deadline | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limiter: RateLimiter | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        page_size: int | None = None,
+        page_parallelism: int | None = None,
     ) -> None:
         if server_url is None:
             server_url = "https://syncsketch.com"
+        if deadline is None:
+            deadline = Deadline()
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        if rate_limiter is None:
+            rate_limiter = get_default_rate_limiter()
+        if circuit_breaker is None:
+            circuit_breaker = get_default_circuit_breaker()
+        if page_size is None:
+            page_size = get_env_int(PAGE_SIZE_ENV_KEY, DEFAULT_PAGE_SIZE)
+        if page_parallelism is None:
+            page_parallelism = get_env_int(
+                PAGE_PARALLELISM_ENV_KEY, DEFAULT_PAGE_PARALLELISM
+            )
 
         self.api_key = api_key
         self.username = username
         self.server_url = server_url.rstrip("/")
+        self.deadline = deadline
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.page_size = max(1, page_size)
+        self.page_parallelism = max(1, page_parallelism)
 
         self._session = requests.Session()
         self._session.headers["Authorization"] = (
@@ -32,68 +190,68 @@ class SyncSketchAPI:
         )
 
     def validate_credentials(self) -> None:
-        response = self._session.get(
-            f"{self.server_url}/api/v1/person/connected/"
+        response = self._request(
+            "GET", f"{self.server_url}/api/v1/person/connected/"
         )
         response.raise_for_status()
 
     def get_account_info(self) -> list[dict[str, Any]]:
-        if self._session is None:
-            raise SessionClosed("Syncsketch session is closed")
-
-        params = dict(
-            active=1,
-            offset=0,
-        )
-        output = []
-        while True:
-            response = self._session.get(
-                self._get_api_endpoint("account"),
-                params=params,
-            )
-            response.raise_for_status()
-            data = response.json()
-            output.extend(data["objects"])
-            meta = data["meta"]
-            if not meta["next"]:
-                break
-            params["offset"] = meta["offset"] + meta["limit"]
-
-        return output
+        return list(self._iter_pages("account", params={"active": 1}))
 
     def get_projects(
         self,
         *,
         fields: Iterable[str] | None = None,
     ) -> list[dict[str, Any]]:
+        return list(self.iter_projects(fields=fields))
+
+    def iter_projects(
+        self,
+        *,
+        fields: Iterable[str] | None = None,
+        name: str | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Iterate active projects, pages are fetched as they're needed.
+
+        Args:
+            fields (Iterable[str] | None): Fields of projects.
+            name (str | None): Only projects with the name, case
+                insensitive. Filtered on server and verified on client.
+
+        """
         params = dict(
             active=1,
             is_archived=0,
             account__active=1,
-            limit=100,
-            offset=0,
         )
         if fields is not None:
             fields = set(fields)
             if "connections" in fields:
                 params["withFullConnections"] = 1
 
+            if name is not None:
+                fields.add("name")
             if fields:
                 params["fields"] = ",".join(fields)
 
-        output = []
-        while True:
-            data = self._do_get(
-                "project",
-                params=params,
-            )
-            output.extend(data["objects"])
-            meta = data["meta"]
-            if not meta["next"]:
-                break
-            params["offset"] = meta["offset"] + meta["limit"]
+        if name is None:
+            return self._iter_pages("project", params=params)
 
-        return output
+        params["name__iexact"] = name
+        return (
+            project
+            for project in self._iter_pages("project", params=params)
+            if project["name"].lower() == name.lower()
+        )
+
+    def get_project_by_name(
+        self,
+        name: str,
+        *,
+        fields: Iterable[str] | None = None,
+    ) -> dict[str, Any] | None:
+        """Get active project by name, case insensitive."""
+        return next(self.iter_projects(fields=fields, name=name), None)
 
     def get_project_by_id(
         self,
@@ -124,33 +282,83 @@ class SyncSketchAPI:
         *,
         fields: Iterable[str] | None = None,
     ) -> list[dict[str, Any]]:
-        limit = 100
-        params = dict(
-            limit=limit,
-            offset=0,
-        )
+        return list(self.iter_reviews(project_id, fields=fields))
+
+    def iter_reviews(
+        self,
+        project_id: int | None = None,
+        *,
+        fields: Iterable[str] | None = None,
+        name: str | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Iterate reviews, pages are fetched as they're needed.
 
+        Args:
+            project_id (int | None): Only reviews of the project.
+            fields (Iterable[str] | None): Fields of reviews.
+            name (str | None): Only reviews with the name. Filtered on
+                server and verified on client.
+
+        """
+        params = {}
         if fields is not None:
             fields = set(fields)
+            if name is not None:
+                fields.add("name")
             if fields:
                 params["fields"] = ",".join(fields)
 
         if project_id:
             params["project_id"] = project_id
 
-        reviews = []
-        while True:
-            data = self._do_get(
-                "review",
-                api_version="v2",
-                params=params,
+        if name is None:
+            return self._iter_pages_without_meta(
+                "review", params=params, api_version="v2"
             )
-            reviews.extend(data)
-            if len(data) < limit:
-                break
-            params["offset"] += limit
 
-        return reviews
+        params["name"] = name
+        return (
+            review
+            for review in self._iter_pages_without_meta(
+                "review", params=params, api_version="v2"
+            )
+            if review["name"] == name
+        )
+
+    def get_review_by_name(
+        self,
+        project_id: int,
+        name: str,
+        *,
+        fields: Iterable[str] | None = None,
+    ) -> dict[str, Any] | None:
+        """Get review of a project by name."""
+        return next(
+            self.iter_reviews(project_id, fields=fields, name=name), None
+        )
+
+    def get_review_by_id(
+        self,
+        review_id: int,
+        *,
+        fields: Iterable[str] | None = None,
+    ) -> dict[str, Any] | None:
+        """Get review by id.
+
+        Returns:
+            dict[str, Any] | None: Review or None if it does not exist.
+
+        """
+        params = {}
+        fields = self._convert_fields(fields)
+        if fields:
+            params["fields"] = fields
+        try:
+            return self._do_get(f"review/{review_id}", params=params)
+        except requests.HTTPError as exc:
+            if getattr(exc.response, "status_code", None) == 404:
+                return None
+            raise
 
     def create_review(
         self,
@@ -177,10 +385,7 @@ class SyncSketchAPI:
         *,
         fields: Iterable[str] | None = None,
     ):
-        params = dict(
-            offset=0,
-            limit=100,
-        )
+        params = {}
         if review_id:
             params["reviews__id"] = review_id
 
@@ -188,19 +393,7 @@ class SyncSketchAPI:
         if fields:
             params["fields"] = fields
 
-        output = []
-        while True:
-            data = self._do_get(
-                "item",
-                params=params,
-            )
-            output.extend(data["objects"])
-            meta = data["meta"]
-            if not meta["next"]:
-                break
-            params["offset"] = meta["offset"] + meta["limit"]
-
-        return output
+        return list(self._iter_pages("item", params=params))
 
     def create_review_item_from_url(
         self,
@@ -220,8 +413,10 @@ class SyncSketchAPI:
         if name:
             body["name"] = name
 
-        response = self._session.post(
+        response = self._request(
+            "POST",
             f"{self.server_url}/items/uploadToReview/{review_id}/",
+            call_type=UPLOAD_CALL,
             data=body,
         )
         response.raise_for_status()
@@ -242,8 +437,10 @@ class SyncSketchAPI:
         if description:
             body["description"] = description
 
-        response = self._session.post(
+        response = self._request(
+            "POST",
             f"{self.server_url}/items/uploadToReview/{review_id}/",
+            call_type=UPLOAD_CALL,
             files={"reviewFile": stream},
             data=body,
         )
@@ -251,26 +448,10 @@ class SyncSketchAPI:
         return response.json()
 
     def get_review_item_frames(self, item_id: int) -> list[dict[str, Any]]:
-        params = dict(
-            offset=0,
-            limit=100,
-            item__id=item_id,
+        return list(
+            self._iter_pages("frame", params={"item__id": item_id})
         )
 
-        output = []
-        while True:
-            data = self._do_get(
-                "frame",
-                params=params,
-            )
-            output.extend(data["objects"])
-            meta = data["meta"]
-            if not meta["next"]:
-                break
-            params["offset"] = meta["offset"] + meta["limit"]
-
-        return output
-
     def prepare_review_item_sketches(
         self, review_id: int, item_id: int
     ) -> list[dict[str, Any]] | None:
@@ -285,13 +466,14 @@ class SyncSketchAPI:
         )
         url = f"{base_endpoint}/{review_id}/{item_id}/"
 
-        response = self._session.post(url, params=params)
+        # Repeated request only creates another export task
+        response = self._request("POST", url, idempotent=True, params=params)
         response.raise_for_status()
 
         task_id = response.json()
         task_url = f"{base_endpoint}/{task_id}/"
         while True:
-            response = self._session.get(task_url)
+            response = self._request("GET", task_url)
             response.raise_for_status()
             result = response.json()
             if result.get("status") == "done":
@@ -300,7 +482,8 @@ class SyncSketchAPI:
             if result.get("status") == "failed":
                 return None
 
-            time.sleep(1)
+            # Poll until the task finishes or budget runs out
+            time.sleep(self.deadline.timeout(1))
 
     def close(self):
         self._session.close()
@@ -312,8 +495,8 @@ class SyncSketchAPI:
         params: dict[str, Any] | None = None,
         api_version: str | None = None,
     ) -> Any:
-        self._validate_session()
-        response = self._session.get(
+        response = self._request(
+            "GET",
             self._get_api_endpoint(endpoint, api_version=api_version),
             params=params,
             headers={"Content-Type": "application/json"},
@@ -321,14 +504,116 @@ class SyncSketchAPI:
         response.raise_for_status()
         return response.json()
 
+    def _iter_pages(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        api_version: str | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Iterate objects of all pages of paginated endpoint.
+
+        First page tells total count of objects, next pages are fetched
+        in batches at the same time. Objects are yielded in order of pages
+        and pages are not fetched after consumer stops iteration.
+
+        """
+        params = {**(params or {}), "limit": self.page_size, "offset": 0}
+        data = self._do_get(endpoint, params=params, api_version=api_version)
+        yield from data["objects"]
+        meta = data["meta"]
+        while meta["next"]:
+            limit = meta["limit"] or self.page_size
+            offset = meta["offset"] + limit
+            end_offset = offset + (limit * self.page_parallelism)
+            total_count = meta.get("total_count")
+            if total_count:
+                end_offset = min(end_offset, total_count)
+            # Objects might have been added meanwhile
+            offsets = range(offset, end_offset, limit) or [offset]
+            for page_data in self._map_pages(
+                endpoint, params, api_version, offsets
+            ):
+                yield from page_data["objects"]
+                meta = page_data["meta"]
+
+    def _iter_pages_without_meta(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        api_version: str | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Iterate objects of all pages of endpoint without total count.
+
+        First page is fetched alone, next pages are fetched speculatively
+        in batches only when it is full, until a page is not full. Pages
+        after the last page are ignored.
+
+        """
+        params = {**(params or {}), "limit": self.page_size}
+        data = self._do_get(
+            endpoint, params={**params, "offset": 0}, api_version=api_version
+        )
+        yield from data
+        # Server might cap the limit, so the first page can be shorter
+        #   than requested even when more objects are available. Page
+        #   shorter than default page size is always the last one.
+        if len(data) < min(self.page_size, DEFAULT_PAGE_SIZE):
+            return
+
+        page_size = len(data)
+        offset = page_size
+        while True:
+            offsets = [
+                offset + (idx * page_size)
+                for idx in range(self.page_parallelism)
+            ]
+            for data in self._map_pages(
+                endpoint, params, api_version, offsets
+            ):
+                yield from data
+                if len(data) < page_size:
+                    return
+            offset = offsets[-1] + page_size
+
+    def _map_pages(
+        self,
+        endpoint: str,
+        params: dict[str, Any],
+        api_version: str | None,
+        offsets: Iterable[int],
+    ) -> list[Any]:
+        """Fetch pages at given offsets at the same time, keep order."""
+        offsets = list(offsets)
+        if not offsets:
+            return []
+
+        span_attributes = get_span_attributes()
+
+        def get_page(offset: int) -> Any:
+            with span_context(**span_attributes):
+                return self._do_get(
+                    endpoint,
+                    params={**params, "offset": offset},
+                    api_version=api_version,
+                )
+
+        if len(offsets) == 1 or self.page_parallelism == 1:
+            return [get_page(offset) for offset in offsets]
+
+        with ThreadPoolExecutor(
+            min(self.page_parallelism, len(offsets)),
+            thread_name_prefix="syncsketch-pages",
+        ) as executor:
+            return list(executor.map(get_page, offsets))
+
     def _do_post(
         self,
         endpoint: str,
         body: dict[str, Any],
         api_version: str | None = None,
     ) -> Any:
-        self._validate_session()
-        response = self._session.post(
+        response = self._request(
+            "POST",
             self._get_api_endpoint(endpoint, api_version=api_version),
             json=body,
             headers={"Content-Type": "application/json"},
@@ -341,12 +626,174 @@ class SyncSketchAPI:
         endpoint: str,
         api_version: str | None = None,
     ) -> Any:
-        self._validate_session()
-        response = self._session.delete(
+        response = self._request(
+            "DELETE",
             self._get_api_endpoint(endpoint, api_version=api_version)
         )
         response.raise_for_status()
 
+    def _request(
+        self,
+        method: str,
+        url: str,
+        idempotent: bool | None = None,
+        call_type: str | None = None,
+        **kwargs
+    ) -> requests.Response:
+        """Send request to SyncSketch server.
+
+        All requests go through this method so duration, failures and
+        sizes of calls are measured per endpoint.
+
+        Requests failed on transient errors are repeated by retry policy.
+        Non-idempotent requests, e.g. uploads, are repeated only if server
+        did not receive or rejected them, so items are not duplicated.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request url.
+            idempotent (bool | None): Request can be safely repeated.
+                Based on method if not set.
+            call_type (str | None): Type of call for rate limits, 'read'
+                or 'write' based on method if not set.
+            **kwargs: Arguments passed to 'requests.Session.request'.
+
+        Returns:
+            requests.Response: Response of last attempt.
+
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if call_type is None:
+            call_type = (
+                READ_CALL
+                if method.upper() in ("GET", "HEAD", "OPTIONS")
+                else WRITE_CALL
+            )
+        endpoint = normalize_endpoint(urlsplit(url).path)
+        # Remember position of streams so they can be sent again
+        streams = [
+            (stream, stream.tell())
+            for stream in (kwargs.get("files") or {}).values()
+            if hasattr(stream, "seek") and hasattr(stream, "tell")
+        ]
+        attempt = 0
+        while True:
+            attempt += 1
+            response = None
+            self._wait_for_rate_limit(call_type)
+            try:
+                response = self._send(method, url, endpoint, **kwargs)
+            except requests.RequestException as exc:
+                retryable = idempotent or _is_connect_error(exc)
+                if (
+                    not retryable
+                    or not self._wait_for_retry(
+                        method, endpoint, attempt, str(exc)
+                    )
+                ):
+                    raise
+            else:
+                status_code = response.status_code
+                retryable = (
+                    status_code in RETRYABLE_STATUS_CODES
+                    if idempotent
+                    else status_code in REJECTED_STATUS_CODES
+                )
+                if (
+                    not retryable
+                    or not self._wait_for_retry(
+                        method,
+                        endpoint,
+                        attempt,
+                        f"Status code {status_code}",
+                        response,
+                    )
+                ):
+                    return response
+
+            for stream, position in streams:
+                stream.seek(position)
+
+    def _wait_for_rate_limit(self, call_type: str) -> None:
+        start = time.perf_counter()
+        if not self.rate_limiter.acquire(call_type, self.deadline.remaining()):
+            raise DeadlineExceeded(
+                "Job ran out of time while waiting for SyncSketch"
+                " rate limit."
+            )
+        RATE_LIMIT_WAIT.observe(
+            time.perf_counter() - start, call_type=call_type
+        )
+
+    def _wait_for_retry(
+        self,
+        method: str,
+        endpoint: str,
+        attempt: int,
+        reason: str,
+        response: requests.Response | None = None,
+    ) -> bool:
+        """Wait before next attempt of a request.
+
+        Returns:
+            bool: Request should be repeated.
+
+        """
+        if attempt >= self.retry_policy.max_attempts:
+            return False
+        delay = self.retry_policy.get_delay(attempt, response)
+        remaining = self.deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            return False
+        logging.warning(
+            f"SyncSketch request {method} '{endpoint}' failed"
+            f" (attempt {attempt}). {reason}. Retrying in {delay:.1f}s."
+        )
+        API_CALL_RETRIES.inc(service="syncsketch", endpoint=endpoint)
+        time.sleep(delay)
+        return True
+
+    def _send(
+        self, method: str, url: str, endpoint: str, **kwargs
+    ) -> requests.Response:
+        self._validate_session()
+        kwargs.setdefault("timeout", self.deadline.timeout())
+        self.circuit_breaker.check()
+        start = time.perf_counter()
+        try:
+            response = self._session.request(method, url, **kwargs)
+        except BaseException:
+            # Outcome must be recorded for any error, otherwise a failed
+            #   trial call would keep the circuit half open forever
+            self.circuit_breaker.record_failure()
+            observe_call(
+                "syncsketch",
+                endpoint,
+                time.perf_counter() - start,
+                status="error",
+                method=method,
+            )
+            raise
+
+        if response.status_code in OUTAGE_STATUS_CODES:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+        body = response.request.body
+        observe_call(
+            "syncsketch",
+            endpoint,
+            time.perf_counter() - start,
+            status=response.status_code,
+            method=method,
+            request_size=(
+                len(body) if isinstance(body, (bytes, str)) else None
+            ),
+            response_size=len(response.content),
+        )
+        return response
+
     def _validate_session(self) -> None:
         if self._session is None:
             raise SessionClosed("Syncsketch session is closed")
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from typing import Any, Iterator
+
+_thread_data = threading.local()
+
+
+class SpanExporter:
+    """Write spans of slow calls as JSON lines to a rotating file.
+
+    Args:
+        path (str): Path to output file.
+        slow_threshold (float): Minimum duration of exported calls in
+            seconds.
+        max_bytes (int): Size of file after which it is rotated.
+        backup_count (int): Number of rotated files that are kept.
+
+    """
+    def __init__(
+        self,
+        path: str,
+        slow_threshold: float = 1.0,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+    ) -> None:
+        dirpath = os.path.dirname(path)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        self._slow_threshold = slow_threshold
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.Logger("syncsketch.spans")
+        self._logger.propagate = False
+        self._logger.addHandler(self._handler)
+
+    def export(self, span: dict[str, Any]) -> None:
+        if span["duration"] < self._slow_threshold:
+            return
+        self._logger.info(json.dumps(span, default=str))
+
+    def close(self) -> None:
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+
+_exporter: SpanExporter | None = None
+
+
+def set_exporter(exporter: SpanExporter | None) -> None:
+    """Set exporter of spans, spans are not recorded without exporter."""
+    global _exporter
+    _exporter = exporter
+
+
+@contextlib.contextmanager
+def span_context(**attributes) -> Iterator[None]:
+    """Add attributes, e.g. event id, to spans recorded in current thread."""
+    previous = getattr(_thread_data, "attributes", {})
+    _thread_data.attributes = {**previous, **attributes}
+    try:
+        yield
+    finally:
+        _thread_data.attributes = previous
+
+
+def get_span_attributes() -> dict[str, Any]:
+    """Attributes of spans recorded in current thread."""
+    return dict(getattr(_thread_data, "attributes", {}))
+
+
+def record_span(
+    service: str,
+    endpoint: str,
+    duration: float,
+    status: int | str | None = None,
+    method: str | None = None,
+    request_size: int | None = None,
+    response_size: int | None = None,
+) -> None:
+    """Record finished call to a service."""
+    exporter = _exporter
+    if exporter is None:
+        return
+    span = {
+        "time": time.time() - duration,
+        "service": service,
+        "endpoint": endpoint,
+        "method": method,
+        "status": status,
+        "duration": round(duration, 4),
+        "requestSize": request_size,
+        "responseSize": response_size,
+        "thread": threading.current_thread().name,
+    }
+    span.update(getattr(_thread_data, "attributes", {}))
+    try:
+        exporter.export(span)
+    except Exception:
+        logging.warning("Failed to export span.", exc_info=True)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from typing import Any, Callable
+
+
+class NoFreeWorker(Exception):
+    pass
+
+
+class WorkersPool:
+    """Bounded pool of threads processing job events.
+
+    The pool does not queue jobs. Job should be submitted only when there
+    is a free slot, so events that can't be processed right away stay
+    'pending' on server where other processors can pick them up.
+
+    Args:
+        max_workers (int): Maximum number of jobs running at the same time.
+        name (str): Prefix of worker thread names.
+        on_job_done (Callable[[], None] | None): Called when a job finishes
+            and its worker is free again.
+
+    """
+    def __init__(
+        self,
+        max_workers: int,
+        name: str = "worker",
+        on_job_done: Callable[[], None] | None = None,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError(
+                f"Workers pool needs at least 1 worker, got {max_workers}."
+            )
+        self._name = name
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        self._futures: set[Future] = set()
+        self._on_job_done = on_job_done
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    @property
+    def running_count(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+    @property
+    def free_slots(self) -> int:
+        return self._max_workers - self.running_count
+
+    def submit(
+        self, func: Callable[..., Any], *args, **kwargs
+    ) -> Future:
+        """Run function in a free worker.
+
+        Raises:
+            NoFreeWorker: All workers are busy.
+
+        """
+        with self._lock:
+            if len(self._futures) >= self._max_workers:
+                raise NoFreeWorker(
+                    f"All {self._max_workers} workers of '{self._name}'"
+                    " are busy."
+                )
+            future = self._executor.submit(func, *args, **kwargs)
+            self._futures.add(future)
+        future.add_done_callback(self._on_future_done)
+        return future
+
+    def wait_for_jobs(self, timeout: float | None = None) -> bool:
+        """Wait until all running jobs finish.
+
+        Returns:
+            bool: All jobs finished before timeout.
+
+        """
+        with self._lock:
+            futures = set(self._futures)
+        _, not_done = wait_futures(futures, timeout)
+        return not not_done
+
+    def shutdown(self, wait: bool = True) -> None:
+        running_count = self.running_count
+        if wait and running_count:
+            logging.info(
+                f"Waiting for {running_count} running jobs"
+                f" of '{self._name}' to finish."
+            )
+        self._executor.shutdown(wait=wait)
+
+    def _on_future_done(self, future: Future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+        if self._on_job_done is not None:
+            self._on_job_done()
+
+        if future.cancelled():
+            return
+
+        exc = future.exception()
+        if exc is not None:
+            logging.error(
+                f"Job in '{self._name}' crashed.",
+                exc_info=(type(exc), exc, exc.__traceback__),
+            )
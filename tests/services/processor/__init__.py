@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# adding processor service directory to sys.path
+processor_dir = Path(os.path.dirname(os.path.abspath(__file__))) \
+    / ".." / ".." / ".." / "services" / "processor"
+sys.path.append(str(processor_dir.resolve()))
@@ -0,0 +1,235 @@
+import copy
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from processor import jobs, leases
+from processor.leases import LEASE_TOPIC, Lease, LeaseManager
+
+LEASE_TIMEOUT = 120
+
+
+class FakeAyonApi:
+    """In-memory replacement of event functions of 'ayon_api'."""
+    def __init__(self):
+        self.events = {}
+        self.updates = []
+
+    def add_event(self, event_id, topic="syncsketch.push", **kwargs):
+        now = leases.format_event_time(time.time())
+        event = {
+            "id": event_id,
+            "topic": topic,
+            "project": "project",
+            "status": "pending",
+            "retries": 0,
+            "summary": {},
+            "payload": {},
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        event.update(kwargs)
+        self.events[event_id] = event
+        return event
+
+    def post(self, endpoint, **kwargs):
+        event_hash = kwargs["hash"]
+        if any(
+            event.get("hash") == event_hash
+            for event in self.events.values()
+        ):
+            return SimpleNamespace(status_code=409)
+        kwargs.pop("store")
+        kwargs.pop("finished")
+        self.add_event(event_hash, status="finished", **kwargs)
+        return SimpleNamespace(status_code=201)
+
+    def get_event(self, event_id):
+        event = self.events[event_id]
+        return copy.deepcopy(event)
+
+    def update_event(self, event_id, **kwargs):
+        kwargs.pop("sender", None)
+        kwargs = {
+            key: value
+            for key, value in kwargs.items()
+            if value is not None
+        }
+        self.updates.append((event_id, kwargs))
+        event = self.events[event_id]
+        event.update(copy.deepcopy(kwargs))
+        event["updatedAt"] = leases.format_event_time(time.time())
+
+    def get_events(
+        self,
+        topics,
+        statuses=None,
+        newer_than=None,
+        older_than=None,
+        fields=None,
+    ):
+        for event in list(self.events.values()):
+            if event["topic"] not in topics:
+                continue
+            if statuses is not None and event["status"] not in statuses:
+                continue
+            # Server filters by time of the last update
+            updated_at = leases.parse_event_time(event["updatedAt"])
+            if (
+                newer_than is not None
+                and updated_at <= leases.parse_event_time(newer_than)
+            ):
+                continue
+            if (
+                older_than is not None
+                and updated_at >= leases.parse_event_time(older_than)
+            ):
+                continue
+            yield copy.deepcopy(event)
+
+
+@pytest.fixture
+def ayon(monkeypatch):
+    fake_api = FakeAyonApi()
+    monkeypatch.setattr(leases, "ayon_api", fake_api)
+    monkeypatch.setattr(jobs, "ayon_api", fake_api)
+    return fake_api
+
+
+@pytest.fixture
+def lease_manager(ayon):
+    return LeaseManager(
+        ["syncsketch.push"],
+        "worker",
+        lease_timeout=LEASE_TIMEOUT,
+        heartbeat_interval=10,
+    )
+
+
+class TestLeaseManager:
+    def test_acquire_same_attempt_once(self, ayon, lease_manager):
+        event = ayon.add_event("event")
+
+        lease = lease_manager.acquire(event)
+
+        assert lease is not None
+        assert lease.attempt == 0
+        assert ayon.events["event"]["status"] == "in_progress"
+        assert lease_manager.acquire(event) is None
+
+    def test_acquire_failed_update_requeues_next_attempt(
+        self, ayon, lease_manager, monkeypatch
+    ):
+        event = ayon.add_event("event")
+        update_event = ayon.update_event
+
+        def fail_in_progress(event_id, **kwargs):
+            if kwargs.get("status") == "in_progress":
+                raise ConnectionError("AYON is not available")
+            update_event(event_id, **kwargs)
+
+        monkeypatch.setattr(ayon, "update_event", fail_in_progress)
+
+        assert lease_manager.acquire(event) is None
+
+        event = ayon.events["event"]
+        assert event["status"] == "pending"
+        assert event["retries"] == 1
+        assert event["payload"][leases.STALE_ATTEMPTS_KEY] == 1
+
+    def test_heartbeat_after_finish(self, ayon, lease_manager):
+        event = ayon.add_event("event")
+        lease = lease_manager.acquire(event)
+
+        assert lease_manager.finish(lease, status="finished")
+        lease_manager.heartbeat()
+
+        assert ayon.events["event"]["status"] == "finished"
+        assert ayon.updates[-1] == ("event", {"status": "finished"})
+
+    def test_heartbeat_loses_requeued_lease(self, ayon, lease_manager):
+        event = ayon.add_event("event")
+        lease = lease_manager.acquire(event)
+        ayon.update_event("event", status="pending", retries=1)
+
+        lease_manager.heartbeat()
+
+        assert lease.lost
+        assert ayon.events["event"]["status"] == "pending"
+        assert not lease_manager.finish(lease, status="finished")
+        assert ayon.events["event"]["status"] == "pending"
+
+    def test_reclaim_pending_with_expired_lease(self, ayon, lease_manager):
+        now = time.time()
+        ayon.add_event(
+            "event",
+            updatedAt=leases.format_event_time(now - LEASE_TIMEOUT - 60),
+        )
+        ayon.add_event(
+            f"{LEASE_TOPIC}.event.0",
+            topic=LEASE_TOPIC,
+            status="finished",
+            summary={"eventId": "event", "attempt": 0},
+            updatedAt=leases.format_event_time(now - LEASE_TIMEOUT - 30),
+        )
+
+        lease_manager.reclaim_expired()
+
+        event = ayon.events["event"]
+        assert event["status"] == "pending"
+        assert event["retries"] == 1
+        assert event["payload"][leases.STALE_ATTEMPTS_KEY] == 1
+
+    def test_reclaim_keeps_pending_without_lease(self, ayon, lease_manager):
+        ayon.add_event(
+            "event",
+            updatedAt=leases.format_event_time(
+                time.time() - LEASE_TIMEOUT - 60
+            ),
+        )
+
+        lease_manager.reclaim_expired()
+
+        assert ayon.events["event"]["retries"] == 0
+        assert ayon.updates == []
+
+    def test_reclaim_fails_stale_event_at_max_attempts(
+        self, ayon, lease_manager
+    ):
+        ayon.add_event(
+            "event",
+            status="in_progress",
+            retries=7,
+            payload={leases.STALE_ATTEMPTS_KEY: 4, "checkpoint": {"a": 1}},
+            updatedAt=leases.format_event_time(
+                time.time() - LEASE_TIMEOUT - 60
+            ),
+        )
+
+        lease_manager.reclaim_expired()
+
+        event = ayon.events["event"]
+        assert event["status"] == "failed"
+        assert event["retries"] == 8
+        assert event["payload"] == {
+            leases.STALE_ATTEMPTS_KEY: 5, "checkpoint": {"a": 1}
+        }
+
+
+class TestJobContextLease:
+    def test_lost_lease_stops_job(self, ayon):
+        ayon.add_event("event")
+        lease = Lease("event", 0, time.time(), time.time())
+        job = jobs.JobContext(ayon.get_event("event"), lease=lease)
+
+        job.mark_item_done("items", 1, "done")
+        job.check_interrupt()
+        lease.lost = True
+        job.mark_item_done("items", 2, "done")
+
+        assert ayon.events["event"]["payload"] == {
+            "checkpoint": {"items": {"1": "done"}}
+        }
+        with pytest.raises(jobs.LeaseLost):
+            job.check_interrupt()
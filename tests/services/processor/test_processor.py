@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from processor import processor
+from processor.event_source import EventSource, EventWakeup
+from processor.workers import WorkersPool
+
+
+class TestListenForEvents:
+    @pytest.fixture
+    def event_source(self, monkeypatch):
+        wakeup = EventWakeup()
+        event_source = EventSource(processor.JOB_TOPICS)
+        event_source.start(wakeup)
+        context = processor._GlobalContext
+        monkeypatch.setattr(context, "stop_event", threading.Event())
+        monkeypatch.setattr(context, "event_wakeup", wakeup)
+        monkeypatch.setattr(context, "event_source", event_source)
+        # Polling would wake up the loop only after a minute
+        monkeypatch.setattr(context, "poll_interval", 60)
+        monkeypatch.setattr(context, "workers_pools", {
+            topic: WorkersPool(1, name=topic)
+            for topic in processor.JOB_TOPICS
+        })
+        monkeypatch.setattr(
+            processor, "_context_has_valid_credentials", lambda: True
+        )
+        yield event_source
+
+    @pytest.fixture
+    def wait_for_claims(self, monkeypatch):
+        claims = []
+        claimed = threading.Condition()
+
+        def claim_job_events(topic, workers_pool):
+            with claimed:
+                claims.append(topic)
+                claimed.notify_all()
+            return 0
+
+        def wait_for_claims(count, timeout):
+            with claimed:
+                return claimed.wait_for(
+                    lambda: len(claims) >= count, timeout
+                )
+
+        monkeypatch.setattr(processor, "_claim_job_events", claim_job_events)
+        yield wait_for_claims
+
+    @pytest.fixture
+    def loop(self, event_source, wait_for_claims):
+        thread = threading.Thread(
+            target=processor.listen_for_events, daemon=True
+        )
+        thread.start()
+        yield thread
+        processor._GlobalContext.stop_event.set()
+        processor._GlobalContext.event_wakeup.notify()
+        thread.join(5)
+        assert not thread.is_alive()
+
+    def test_job_event_wakes_up_loop(
+        self, event_source, wait_for_claims, loop
+    ):
+        topics_count = len(processor.JOB_TOPICS)
+        assert wait_for_claims(topics_count, 5)
+
+        start = time.monotonic()
+        event_source.on_event({"topic": processor.PUSH_TOPIC})
+
+        assert wait_for_claims(topics_count * 2, 5)
+        assert time.monotonic() - start < 5
+
+    def test_other_event_does_not_wake_up_loop(
+        self, event_source, wait_for_claims, loop
+    ):
+        topics_count = len(processor.JOB_TOPICS)
+        assert wait_for_claims(topics_count, 5)
+
+        event_source.on_event({"topic": "entity.version.created"})
+
+        assert not wait_for_claims(topics_count + 1, 0.5)
+
+    def test_callback_of_subscribed_topic(self):
+        received = []
+        event_source = EventSource(processor.JOB_TOPICS)
+        event_source.subscribe(["settings.changed"], received.append)
+        event_source.start(EventWakeup())
+
+        event_source.on_event({"topic": "settings.changed"})
+        event_source.on_event({"topic": processor.PULL_TOPIC})
+
+        assert received == [{"topic": "settings.changed"}]
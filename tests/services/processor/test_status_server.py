@@ -0,0 +1,57 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from processor import processor
+from processor.metrics import TRANSFERRED_BYTES, measure_call
+from processor.status_server import StatusServer
+
+
+class TestStatusServer:
+    @pytest.fixture
+    def status_server(self):
+        status_server = StatusServer(0, host="127.0.0.1")
+        status_server.add_route("/metrics", processor._metrics_route)
+        status_server.start()
+        yield status_server
+        status_server.stop()
+
+    def _get(self, status_server, path):
+        url = f"http://127.0.0.1:{status_server.port}{path}"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return (
+                response.status,
+                response.headers["Content-Type"],
+                response.read().decode("utf-8"),
+            )
+
+    def test_random_port(self, status_server):
+        assert status_server.port != 0
+
+    def test_scrape_metrics(self, status_server):
+        TRANSFERRED_BYTES.inc(
+            1024, service="syncsketch", direction="upload"
+        )
+        measure_call("ayon", lambda: None)
+
+        status_code, content_type, body = self._get(
+            status_server, "/metrics"
+        )
+
+        assert status_code == 200
+        assert content_type.startswith("text/plain; version=0.0.4")
+        assert "# TYPE syncsketch_transferred_bytes_total counter" in body
+        assert (
+            'syncsketch_transferred_bytes_total'
+            '{service="syncsketch",direction="upload"}'
+        ) in body
+        assert (
+            'syncsketch_api_call_duration_seconds_count'
+            '{service="ayon",endpoint="<lambda>"}'
+        ) in body
+
+    def test_unknown_route(self, status_server):
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            self._get(status_server, "/unknown")
+        assert exc_info.value.code == 404
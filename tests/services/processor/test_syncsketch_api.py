@@ -0,0 +1,256 @@
+import io
+import math
+import threading
+from types import SimpleNamespace
+
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from processor import syncsketch_api
+from processor.circuit_breaker import CircuitBreaker
+from processor.rate_limit import RateLimiter
+from processor.syncsketch_api import RetryPolicy, SyncSketchAPI
+
+SERVER_URL = "https://syncsketch.test"
+# Maximum page size returned by fake server
+SERVER_MAX_LIMIT = 100
+
+
+def create_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    response.request = SimpleNamespace(body=None)
+    return response
+
+
+class FakeSession:
+    """Session returning prepared outcomes of requests in order.
+
+    Outcome is a status code, a response or an exception to raise.
+    Uploaded streams are read like by a real session.
+
+    """
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        files = kwargs.get("files") or {}
+        self.requests.append({
+            "method": method,
+            "url": url,
+            "files": {key: stream.read() for key, stream in files.items()},
+        })
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, int):
+            outcome = create_response(outcome)
+        return outcome
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(syncsketch_api.time, "sleep", delays.append)
+    return delays
+
+
+def create_api(outcomes, max_attempts=3):
+    api = SyncSketchAPI(
+        "user",
+        "key",
+        server_url=SERVER_URL,
+        retry_policy=RetryPolicy(
+            max_attempts=max_attempts, base_delay=0.01, max_delay=5.0
+        ),
+        rate_limiter=RateLimiter({}),
+        circuit_breaker=CircuitBreaker("syncsketch", failure_threshold=100),
+    )
+    api._session = FakeSession(outcomes)
+    return api
+
+
+def upload(api):
+    stream = io.BytesIO(b"media")
+    return api._request(
+        "POST",
+        f"{SERVER_URL}/items/uploadToReview/1/",
+        call_type=syncsketch_api.UPLOAD_CALL,
+        files={"reviewFile": stream},
+        data={"name": "item"},
+    )
+
+
+def connect_error():
+    return requests.ConnectionError(
+        NewConnectionError(None, "Connection refused")
+    )
+
+
+class TestRequestRetries:
+    def test_upload_not_repeated_on_bad_gateway(self, sleeps):
+        api = create_api([502, 201])
+
+        response = upload(api)
+
+        assert response.status_code == 502
+        assert len(api._session.requests) == 1
+        assert sleeps == []
+
+    def test_upload_repeated_when_unavailable(self, sleeps):
+        api = create_api([503, 201])
+
+        response = upload(api)
+
+        assert response.status_code == 201
+        assert [
+            request["files"]["reviewFile"]
+            for request in api._session.requests
+        ] == [b"media", b"media"]
+        assert len(sleeps) == 1
+
+    def test_upload_repeated_on_connect_error(self, sleeps):
+        api = create_api([connect_error(), 201])
+
+        response = upload(api)
+
+        assert response.status_code == 201
+        assert [
+            request["files"]["reviewFile"]
+            for request in api._session.requests
+        ] == [b"media", b"media"]
+
+    def test_upload_not_repeated_on_read_timeout(self, sleeps):
+        api = create_api([requests.ReadTimeout("timed out"), 201])
+
+        with pytest.raises(requests.ReadTimeout):
+            upload(api)
+
+        assert len(api._session.requests) == 1
+
+    def test_get_repeated_up_to_max_attempts(self, sleeps):
+        api = create_api([502, 502, 502, 200], max_attempts=3)
+
+        response = api._request("GET", f"{SERVER_URL}/api/v1/project/")
+
+        assert response.status_code == 502
+        assert len(api._session.requests) == 3
+        assert len(sleeps) == 2
+
+    def test_get_respects_retry_after(self, sleeps):
+        api = create_api([
+            create_response(429, {"Retry-After": "2"}),
+            200,
+        ])
+
+        response = api._request("GET", f"{SERVER_URL}/api/v1/project/")
+
+        assert response.status_code == 200
+        assert sleeps == [2.0]
+
+    def test_retry_after_capped_by_max_delay(self, sleeps):
+        api = create_api([
+            create_response(503, {"Retry-After": "120"}),
+            200,
+        ])
+
+        api._request("GET", f"{SERVER_URL}/api/v1/project/")
+
+        assert sleeps == [5.0]
+
+
+class FakePaginatedServer:
+    """Paginated endpoints of v1 api with meta and v2 api without meta.
+
+    Requested limit is capped by server like on SyncSketch.
+
+    """
+    def __init__(self, count):
+        self.objects = [
+            {"id": idx, "name": f"name-{idx}"}
+            for idx in range(count)
+        ]
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, endpoint, params=None, api_version=None):
+        params = params or {}
+        with self._lock:
+            self.requests.append((endpoint, params))
+        objects = self.objects
+        if "name__iexact" in params:
+            name = params["name__iexact"].lower()
+            objects = [obj for obj in objects if obj["name"] == name]
+        if "name" in params:
+            objects = [
+                obj for obj in objects if obj["name"] == params["name"]
+            ]
+        limit = min(params["limit"], SERVER_MAX_LIMIT)
+        offset = params["offset"]
+        page = objects[offset:offset + limit]
+        if api_version == "v2":
+            return page
+        return {
+            "objects": page,
+            "meta": {
+                "limit": limit,
+                "offset": offset,
+                "total_count": len(objects),
+                "next": "next" if offset + limit < len(objects) else None,
+            },
+        }
+
+
+def create_paginated_api(count, page_size):
+    api = SyncSketchAPI(
+        "user",
+        "key",
+        server_url=SERVER_URL,
+        rate_limiter=RateLimiter({}),
+        circuit_breaker=CircuitBreaker("syncsketch"),
+        page_size=page_size,
+        page_parallelism=4,
+    )
+    server = FakePaginatedServer(count)
+    api._do_get = server.get
+    return api, server
+
+
+class TestPagination:
+    @pytest.mark.parametrize("page_size", [50, 100, 500])
+    @pytest.mark.parametrize("count", [0, 99, 100, 1037])
+    def test_pages_with_meta(self, page_size, count):
+        api, server = create_paginated_api(count, page_size)
+
+        projects = list(api.iter_projects())
+
+        assert [project["id"] for project in projects] == list(range(count))
+        # Total count is known, pages after the last one are not fetched
+        page_limit = min(page_size, SERVER_MAX_LIMIT)
+        assert len(server.requests) == max(1, math.ceil(count / page_limit))
+
+    @pytest.mark.parametrize("page_size", [50, 100, 500])
+    @pytest.mark.parametrize("count", [0, 99, 100, 1037])
+    def test_pages_without_meta(self, page_size, count):
+        api, server = create_paginated_api(count, page_size)
+
+        reviews = list(api.iter_reviews(1))
+
+        assert [review["id"] for review in reviews] == list(range(count))
+
+    @pytest.mark.parametrize("page_size", [50, 100, 500])
+    def test_stops_at_first_match(self, page_size):
+        api, server = create_paginated_api(1037, page_size)
+
+        assert api.get_project_by_name("NAME-0")["id"] == 0
+        assert next(api.iter_projects())["id"] == 0
+        assert api.get_review_by_name(1, "name-0")["id"] == 0
+        assert next(api.iter_reviews(1))["id"] == 0
+        assert len(server.requests) == 4